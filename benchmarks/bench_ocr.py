@@ -0,0 +1,83 @@
+"""
+OCR backend micro-benchmark: per-page latency of tesserocr vs pytesseract.
+
+    python -m benchmarks.bench_ocr some_scan.pdf [more.pdf ...] --dpi 300 --repeat 3
+
+Pages are rendered once up front, so only OCR time is measured. The first
+call of each backend (engine/traineddata load) is reported separately.
+"""
+import argparse
+import statistics
+import sys
+import time
+
+from services.pdf_engine import get_ocr_backend, _render_page
+from pdf2image import pdfinfo_from_path
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def _render_all(paths, dpi):
+    images = []
+    for path in paths:
+        pages = int(pdfinfo_from_path(path)["Pages"])
+        for page_no in range(1, pages + 1):
+            images.extend(_render_page(path, page_no, dpi))
+    return images
+
+
+def bench(backend_name, images, repeat):
+    t0 = time.perf_counter()
+    backend = get_ocr_backend(backend_name)
+    init_ms = (time.perf_counter() - t0) * 1000
+    if backend.name != backend_name:
+        print(f"{backend_name:<12} unavailable (fell back to {backend.name}), skipped")
+        return
+
+    # Warm-up call: engine + language data load on first use
+    t0 = time.perf_counter()
+    backend.ocr(images[0])
+    first_ms = (time.perf_counter() - t0) * 1000
+
+    timings = []
+    for _ in range(repeat):
+        for img in images:
+            t0 = time.perf_counter()
+            backend.ocr(img)
+            timings.append((time.perf_counter() - t0) * 1000)
+
+    print(
+        f"{backend_name:<12} init {init_ms:7.1f} ms | first page {first_ms:7.1f} ms | "
+        f"mean {statistics.mean(timings):7.1f} ms | p50 {_percentile(timings, 50):7.1f} ms | "
+        f"p95 {_percentile(timings, 95):7.1f} ms | n={len(timings)}"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="+")
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backends", default="tesserocr,pytesseract")
+    args = parser.parse_args(argv)
+
+    images = _render_all(args.pdfs, args.dpi)
+    if not images:
+        print("No pages rendered.", file=sys.stderr)
+        return 1
+    print(f"{len(images)} page(s) at {args.dpi} DPI, {args.repeat} round(s)\n")
+
+    for name in args.backends.split(","):
+        bench(name.strip(), images, args.repeat)
+
+    for img in images:
+        img.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
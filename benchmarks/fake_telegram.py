@@ -0,0 +1,168 @@
+"""
+Fake Telegram Bot API server for load tests: no real chats, no Telegram limits.
+
+    python -m benchmarks.fake_telegram --port 8081
+    TELEGRAM_API_URL=http://127.0.0.1:8081 BOT_TOKEN=123456:fake python main.py
+
+The bot long-polls getUpdates here as usual. benchmarks/run_load.py injects
+PDF messages through /_control/send. getFile and file downloads serve those
+PDFs, and every sendMessage / editMessageText / deleteMessage is recorded
+with a timestamp (/_control/calls) so the driver can time each stage.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import time
+
+from aiohttp import web
+
+BOT_USER = {"id": 100000001, "is_bot": True, "first_name": "FakeAlice", "username": "fake_alice_bot"}
+RECORDED = {"sendMessage", "editMessageText", "deleteMessage", "sendDocument", "answerCallbackQuery"}
+
+
+class FakeTelegram:
+    def __init__(self):
+        self.updates = []
+        self.calls = []
+        self.files = {}                       # file_id -> local path
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._new_update = asyncio.Event()
+
+    # ---------- Bot API ----------
+    async def bot_method(self, request: web.Request):
+        method = request.match_info["method"]
+        params = dict(await request.post()) if request.body_exists else {}
+        params.update(request.query)
+        if request.content_type == "application/json":
+            params.update(await request.json())
+
+        handler = getattr(self, f"api_{method}", None)
+        if method in RECORDED:
+            self._record(method, params)
+        result = await handler(params) if handler else True
+        return web.json_response({"ok": True, "result": result})
+
+    def _record(self, method: str, params: dict):
+        def as_int(key):
+            return int(params[key]) if params.get(key) not in (None, "") else None
+
+        reply_to = as_int("reply_to_message_id")
+        if reply_to is None and params.get("reply_parameters"):
+            reply_to = json.loads(params["reply_parameters"]).get("message_id")
+        self.calls.append({
+            "t": time.time(),
+            "method": method,
+            "chat_id": as_int("chat_id"),
+            "message_id": as_int("message_id"),
+            "reply_to_message_id": reply_to,
+            "text": params.get("text", ""),
+        })
+
+    def _message(self, chat_id, text, message_id=None):
+        return {
+            "message_id": message_id or next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id), "type": "private"},
+            "from": BOT_USER,
+            "text": text,
+        }
+
+    async def api_getMe(self, params):
+        return BOT_USER
+
+    async def api_getUpdates(self, params):
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        self.updates = [u for u in self.updates if u["update_id"] >= offset]
+        if not self.updates and timeout:
+            self._new_update.clear()
+            try:
+                await asyncio.wait_for(self._new_update.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.updates[:100]
+
+    async def api_sendMessage(self, params):
+        msg = self._message(params["chat_id"], params.get("text", ""))
+        self.calls[-1]["message_id"] = msg["message_id"]
+        return msg
+
+    async def api_editMessageText(self, params):
+        return self._message(params["chat_id"], params.get("text", ""), int(params["message_id"]))
+
+    async def api_getFile(self, params):
+        file_id = params["file_id"]
+        path = self.files[file_id]
+        return {"file_id": file_id, "file_unique_id": file_id, "file_size": os.path.getsize(path),
+                "file_path": f"documents/{file_id}.pdf"}
+
+    async def download(self, request: web.Request):
+        file_id = os.path.splitext(os.path.basename(request.match_info["path"]))[0]
+        if file_id not in self.files:
+            raise web.HTTPNotFound()
+        return web.FileResponse(self.files[file_id])
+
+    # ---------- Control API (used by the load-test driver) ----------
+    async def control_send(self, request: web.Request):
+        """{"user_id": 1, "pdf": "/abs/path.pdf", "file_unique_id": "optional"} -> queues a PDF message."""
+        body = await request.json()
+        user_id, path = int(body["user_id"]), os.path.abspath(body["pdf"])
+        message_id = next(self._message_ids)
+        file_id = f"f{message_id}"
+        self.files[file_id] = path
+
+        self.updates.append({
+            "update_id": next(self._update_ids),
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": user_id, "is_bot": False, "first_name": f"Driver{user_id}"},
+                "document": {
+                    "file_id": file_id,
+                    "file_unique_id": body.get("file_unique_id") or file_id,
+                    "file_name": os.path.basename(path),
+                    "mime_type": "application/pdf",
+                    "file_size": os.path.getsize(path),
+                },
+            },
+        })
+        self._new_update.set()
+        return web.json_response({"message_id": message_id, "t": time.time()})
+
+    async def control_calls(self, request: web.Request):
+        since = int(request.query.get("since", 0))
+        return web.json_response(self.calls[since:])
+
+    async def control_reset(self, request: web.Request):
+        self.calls.clear()
+        self.files.clear()
+        return web.json_response({"ok": True})
+
+
+def make_app() -> web.Application:
+    fake = FakeTelegram()
+    app = web.Application()
+    app.router.add_route("*", "/bot{token}/{method}", fake.bot_method)
+    app.router.add_get("/file/bot{token}/{path:.+}", fake.download)
+    app.router.add_post("/_control/send", fake.control_send)
+    app.router.add_get("/_control/calls", fake.control_calls)
+    app.router.add_post("/_control/reset", fake.control_reset)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    args = parser.parse_args()
+
+    print(f"Fake Telegram Bot API on http://{args.host}:{args.port}")
+    web.run_app(make_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+End-to-end load test of the PDF pipeline (handlers/processor.py) against local fakes.
+
+    python -m benchmarks.stub_deepseek --port 8090 --latency 2 --stream-seconds 3
+    python -m benchmarks.fake_telegram --port 8081
+    TELEGRAM_API_URL=http://127.0.0.1:8081 BOT_TOKEN=123456:fake \\
+        DEEPSEEK_URL=http://127.0.0.1:8090/v1/chat/completions DEEPSEEK_API_KEY=stub \\
+        DATABASE_URL=sqlite+aiosqlite:///./loadtest.db python main.py 2> bot.log
+    DATABASE_URL=sqlite+aiosqlite:///./loadtest.db BOT_TOKEN=123456:fake \\
+        python -m benchmarks.run_load --users 20 --per-user 3 --bot-log bot.log samples/*.pdf
+
+N simulated users each send their PDFs at once (cycling through the given
+files). Each driver user is seeded as an active Pro user in the bot's
+database first.
+
+Stage times are the bot's own: every job logs a "Job timing {...}" line
+(handlers/processor.py) with the seconds it spent queued (upload accepted
+-> download starts) and in each stage (download, extract, analyze, mileage,
+send). Pass every log that has them with --bot-log: main.py's, or each
+worker.py's in JOB_QUEUE_MODE=shared. Status edits are not used for timing,
+the outbox merges or drops them under load. "total" is measured here:
+PDF message sent -> result message received.
+
+The text/result caches are off by default, so every PDF takes the cold
+path; for warm-path numbers run the bot with e.g. TEXT_CACHE_TTL_HOURS=24
+RESULT_CACHE_TTL_HOURS=24.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+STAGES = ("queue", "download", "extract", "analyze", "mileage", "send", "total")
+TIMING_LINE = re.compile(r"Job timing (\{.*\})\s*$")
+FIRST_USER_ID = 900000000
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+async def seed_users(user_ids):
+    """Driver users must pass the Pro gate in handlers/processor.py."""
+    from sqlalchemy import select
+    from database.connection import AsyncSessionLocal, init_db
+    from database.models import User
+
+    await init_db()
+    async with AsyncSessionLocal() as session:
+        existing = {
+            u.tg_id: u for u in (await session.execute(select(User).where(User.tg_id.in_(user_ids)))).scalars()
+        }
+        for uid in user_ids:
+            user = existing.get(uid) or User(tg_id=uid, username=f"load{uid}")
+            user.is_pro = True
+            user.expiry_date = datetime.utcnow() + timedelta(days=1)
+            session.add(user)
+        await session.commit()
+
+
+def result_of(sent: dict, calls: list) -> dict:
+    """When (and whether successfully) the reply to one PDF arrived, from the recorded Bot API calls."""
+    replies = [c for c in calls if c["method"] == "sendMessage" and c["reply_to_message_id"] == sent["message_id"]]
+    result = next((c for c in replies if "Queued" not in c["text"]), None)
+    if result is None:
+        return {}
+    return {"total": result["t"] - sent["t"], "done": result["t"], "error": "Error" in result["text"]}
+
+
+def read_timings(paths) -> dict:
+    """(chat_id, reply_to_id) -> stage seconds of the job's last attempt, from the bots' logs."""
+    timings = {}
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if match := TIMING_LINE.search(line):
+                    record = json.loads(match.group(1))
+                    timings[(record["chat_id"], record["reply_to_id"])] = record
+    return timings
+
+
+async def run(args):
+    user_ids = [FIRST_USER_ID + i for i in range(args.users)]
+    if not args.no_seed:
+        await seed_users(user_ids)
+
+    async with httpx.AsyncClient(base_url=args.telegram, timeout=30) as client:
+        since = len((await client.get("/_control/calls")).json())
+
+        async def user_session(n, uid):
+            jobs = []
+            for k in range(args.per_user):
+                pdf = args.pdfs[(n * args.per_user + k) % len(args.pdfs)]
+                body = {"user_id": uid, "pdf": os.path.abspath(pdf)}
+                # Private chat: chat_id is the user id, as the bot logs it
+                jobs.append({**(await client.post("/_control/send", json=body)).json(), "user_id": uid})
+            return jobs
+
+        t0 = time.time()
+        sent = [job for jobs in await asyncio.gather(*(user_session(n, uid) for n, uid in enumerate(user_ids)))
+                for job in jobs]
+        print(f"Sent {len(sent)} PDFs from {args.users} users, waiting for results...")
+
+        results = {}
+        deadline = time.time() + args.timeout
+        while time.time() < deadline:
+            await asyncio.sleep(1)
+            calls = (await client.get("/_control/calls", params={"since": since})).json()
+            for job in sent:
+                if job["message_id"] not in results and (times := result_of(job, calls)):
+                    results[job["message_id"]] = times
+            if len(results) == len(sent):
+                break
+
+    if not results:
+        print("No results arrived. Is the bot running against this fake server?")
+        return 1
+
+    if args.bot_log:
+        # A job logs its timing right after its last stage; give the bots a moment to catch up
+        await asyncio.sleep(1)
+        timings = read_timings(args.bot_log)
+        for job in sent:
+            if job["message_id"] in results:
+                record = timings.get((job["user_id"], job["message_id"]), {})
+                results[job["message_id"]].update({s: record[s] for s in STAGES if s in record})
+    else:
+        print("No --bot-log given: only total times are shown.")
+
+    finished = list(results.values())
+
+    wall = max(r["done"] for r in finished) - t0
+    errors = sum(1 for r in finished if r["error"])
+    print(f"\nCompleted {len(finished)}/{len(sent)} ({errors} errors) in {wall:.1f}s "
+          f"-> {len(finished) / wall:.2f} PDFs/s, {len(finished) * 60 / wall:.0f} PDFs/min\n")
+    print(f"{'stage':<10}{'n':>6}{'p50 s':>10}{'p95 s':>10}{'p99 s':>10}{'mean s':>10}")
+    for stage in STAGES:
+        values = [r[stage] for r in finished if stage in r]
+        if values:
+            print(f"{stage:<10}{len(values):>6}{_percentile(values, 50):>10.2f}{_percentile(values, 95):>10.2f}"
+                  f"{_percentile(values, 99):>10.2f}{statistics.mean(values):>10.2f}")
+    return 0 if len(finished) == len(sent) else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="+")
+    parser.add_argument("--telegram", default="http://127.0.0.1:8081", help="fake Bot API server")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--per-user", type=int, default=1, help="PDFs each user sends at once")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds to wait for all results")
+    parser.add_argument("--bot-log", action="append", default=[],
+                        help="bot or worker log with 'Job timing' lines for the stage breakdown (repeatable)")
+    parser.add_argument("--no-seed", action="store_true", help="don't create Pro users in DATABASE_URL")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Local stand-in for DeepSeek's /v1/chat/completions, for load tests without API credits.
+
+    python -m benchmarks.stub_deepseek --port 8090 --latency 2.5 --jitter 1.0 --stream-seconds 4
+    DEEPSEEK_URL=http://127.0.0.1:8090/v1/chat/completions DEEPSEEK_API_KEY=stub python main.py
+
+Every request waits `latency` (+ up to `jitter`) seconds, then answers with a
+canned extraction JSON: in one piece, or as SSE chunks spread over
+`stream-seconds` when the request asks for "stream": true. The default answer
+carries total_miles, so the bot skips OSRM routing (streamed stops are still
+pre-geocoded in the background).
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from aiohttp import web
+
+DEFAULT_ANSWER = {
+    "broker": "Stub Logistics LLC",
+    "load_number": "STUB12345",
+    "weight": "42,000 lbs",
+    "pu_number": "PU778899",
+    "del_number": "N/A",
+    "bol_number": "N/A",
+    "ref_number": "REF-55",
+    "pickups": [{"facility": "Stub Shipper", "address": "100 Main St, Dallas, TX 75201", "time": "01/02/2025 08:00"}],
+    "deliveries": [{"facility": "Stub Receiver", "address": "500 Elm St, Houston, TX 77002", "time": "01/03/2025 10:00"}],
+    "rate": "1500.00",
+    "total_miles": "240",
+}
+
+CHUNK_CHARS = 16
+
+
+def _usage(prompt: str, content: str) -> dict:
+    prompt_tokens, completion_tokens = len(prompt) // 4, len(content) // 4
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+def make_app(answer: dict, latency: float, jitter: float, stream_seconds: float) -> web.Application:
+    content = json.dumps(answer, indent=2)
+    stats = {"requests": 0, "streamed": 0}
+
+    async def completions(request: web.Request):
+        body = await request.json()
+        stats["requests"] += 1
+        prompt = "".join(m.get("content", "") for m in body.get("messages", []))
+        await asyncio.sleep(latency + random.uniform(0, jitter))
+
+        created = int(time.time())
+        if not body.get("stream"):
+            return web.json_response({
+                "id": f"stub-{stats['requests']}",
+                "object": "chat.completion",
+                "created": created,
+                "model": body.get("model", "deepseek-chat"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": _usage(prompt, content),
+            })
+
+        stats["streamed"] += 1
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await resp.prepare(request)
+
+        chunks = [content[i:i + CHUNK_CHARS] for i in range(0, len(content), CHUNK_CHARS)]
+        delay = stream_seconds / max(1, len(chunks))
+        for i, piece in enumerate(chunks):
+            event = {"id": f"stub-{stats['requests']}", "object": "chat.completion.chunk", "created": created,
+                     "choices": [{"index": 0, "delta": {"content": piece},
+                                  "finish_reason": "stop" if i == len(chunks) - 1 else None}]}
+            await resp.write(f"data: {json.dumps(event)}\n\n".encode())
+            await asyncio.sleep(delay)
+
+        if (body.get("stream_options") or {}).get("include_usage"):
+            event = {"choices": [], "usage": _usage(prompt, content)}
+            await resp.write(f"data: {json.dumps(event)}\n\n".encode())
+        await resp.write(b"data: [DONE]\n\n")
+        await resp.write_eof()
+        return resp
+
+    async def get_stats(request: web.Request):
+        return web.json_response(stats)
+
+    app = web.Application(client_max_size=16 * 1024 * 1024)
+    app.router.add_post("/v1/chat/completions", completions)
+    app.router.add_post("/chat/completions", completions)
+    app.router.add_get("/_stats", get_stats)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=2.0, help="seconds before the first byte")
+    parser.add_argument("--jitter", type=float, default=0.5, help="extra random latency, seconds")
+    parser.add_argument("--stream-seconds", type=float, default=3.0, help="time to stream the whole answer")
+    parser.add_argument("--answer", help="JSON file to return instead of the built-in load")
+    args = parser.parse_args()
+
+    answer = DEFAULT_ANSWER
+    if args.answer:
+        with open(args.answer, encoding="utf-8") as f:
+            answer = json.load(f)
+
+    print(f"DeepSeek stub on http://{args.host}:{args.port}/v1/chat/completions")
+    web.run_app(make_app(answer, args.latency, args.jitter, args.stream_seconds),
+                host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,8 +11,12 @@ if not BOT_TOKEN:
 
 # DeepSeek API sozlamalari
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
-# DeepSeek API uchun asosiy URL manzili
-DEEPSEEK_URL = "https://api.deepseek.com/v1/chat/completions"
+# DeepSeek API uchun asosiy URL manzili (load test uchun lokal stub-ga yo'naltirish mumkin)
+DEEPSEEK_URL = os.getenv("DEEPSEEK_URL", "https://api.deepseek.com/v1/chat/completions")
+
+# Telegram Bot API server manzili (bo'sh bo'lsa api.telegram.org ishlatiladi).
+# Lokal Bot API server yoki benchmarks/fake_telegram.py uchun
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
 
 if not DEEPSEEK_API_KEY:
     # Agarda DeepSeek bo'lmasa bot ishlayverishi mumkin, 
@@ -37,3 +41,50 @@ PAYMENT_PROVIDER_TOKEN = os.getenv("PAYMENT_PROVIDER_TOKEN", "")
 # Admin ID-lar (Xatoliklar yoki statistikani ko'rish uchun)
 # .env faylida: ADMIN_IDS=1234567,8901234 ko'rinishida yoziladi
 ADMIN_IDS = [int(admin_id) for admin_id in os.getenv("ADMIN_IDS", "").split(",") if admin_id]
+
+# PDF pipeline sozlamalari
+# Pipeline bosqichlari: har birining o'z navbati va parallel ishchilar soni bor.
+# Bir vaqtning o'zida nechta PDF-dan matn olinadi (OCR o'zi alohida process pool-da)
+PROCESS_CONCURRENCY = int(os.getenv("PROCESS_CONCURRENCY", "3"))
+# Tarmoq bosqichlari (Telegram yuklab olish, DeepSeek, geocoding/OSRM, javob yuborish)
+# CPU ishlatmaydi, shuning uchun ko'proq parallel bo'lishi mumkin
+DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", "4"))
+ANALYZE_CONCURRENCY = int(os.getenv("ANALYZE_CONCURRENCY", "8"))
+MILEAGE_CONCURRENCY = int(os.getenv("MILEAGE_CONCURRENCY", "8"))
+SEND_CONCURRENCY = int(os.getenv("SEND_CONCURRENCY", "4"))
+
+# Katta PDF-lar rad etiladi (Telegram Bot API baribir 20 MB-dan kattasini bermaydi)
+MAX_PDF_SIZE_MB = float(os.getenv("MAX_PDF_SIZE_MB", "20"))
+# Shu hajmdan kichik PDF-lar butunlay xotirada qayta ishlanadi,
+# kattalari esa diskka bo'laklab yoziladi
+PDF_SPOOL_THRESHOLD_MB = float(os.getenv("PDF_SPOOL_THRESHOLD_MB", "5"))
+
+# Telegram-ga chiquvchi so'rovlar limiti (Telegram qoidalari bo'yicha):
+# umumiy ~30/s, bitta chatga ~1/s, guruhga 20 ta/minut
+TG_GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", "30"))
+TG_CHAT_RATE = float(os.getenv("TG_CHAT_RATE", "1"))
+# Chatga qisqa muddatli "portlash" (masalan javob + status o'chirish birga ketadi), o'rtacha tezlik baribir ~1/s
+TG_CHAT_BURST = float(os.getenv("TG_CHAT_BURST", "3"))
+TG_GROUP_PER_MINUTE = float(os.getenv("TG_GROUP_PER_MINUTE", "20"))
+
+# Navbat (scheduler): barcha foydalanuvchilar uchun bitta umumiy navbat.
+# Bir vaqtda pipeline-da nechta PDF bo'lishi mumkin
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "12"))
+# Bitta foydalanuvchining bir vaqtda ishlanayotgan PDF-lari soni
+MAX_INFLIGHT_PER_USER = int(os.getenv("MAX_INFLIGHT_PER_USER", "2"))
+# Ustuvorlik sinflari va ularning og'irligi (weighted round-robin), masalan: admin:8,pro:4,trial:1
+PRIORITY_WEIGHTS = {
+    name.strip(): int(weight)
+    for name, weight in (
+        pair.split(":") for pair in os.getenv("PRIORITY_WEIGHTS", "admin:8,pro:4,trial:1").split(",") if pair
+    )
+}
+
+# Navbat rejimi: "local" — hamma ish shu bot jarayonida bajariladi;
+# "shared" — bot faqat PDF qabul qiladi va javob yuboradi, ishni esa bitta DB-ga
+# ulangan worker.py jarayonlari (bir nechta server/konteyner bo'lishi mumkin) bajaradi
+JOB_QUEUE_MODE = os.getenv("JOB_QUEUE_MODE", "local").lower()
+# "shared" rejimida ishlayotgan worker.py jarayonlari soni. Limitlar har bir jarayonda
+# alohida hisoblanadi, shuning uchun umumiy limitlar shu songa bo'linadi:
+# TG_GLOBAL_RATE polling jarayoni + worker-lar orasida, NOMINATIM_RPS worker-lar orasida
+JOB_WORKERS = max(1, int(os.getenv("JOB_WORKERS", "1")))
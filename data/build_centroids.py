@@ -0,0 +1,74 @@
+"""
+Builds data/us_centroids.bin for services/distance_estimator.py.
+
+    pip install zipcodes        # build-time only, not a bot dependency
+    python -m data.build_centroids
+
+Source: the `zipcodes` package's bundled US ZIP database (MIT licensed),
+which carries a centroid lat/long for every ZIP. City centroids are the
+mean of their ZIP centroids. Coordinates are stored as int16 hundredths
+of a degree (~1 km), which is plenty for a circuity-based estimate.
+"""
+import os
+import struct
+import sys
+from array import array
+from collections import defaultdict
+
+from services.distance_estimator import (
+    COORD_SCALE, HEADER_SIZE, MAGIC, VERSION, city_key, city_key_hash,
+)
+
+OUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "us_centroids.bin")
+
+
+def _xy(lat: float, lon: float):
+    return int(round(lat * COORD_SCALE)), int(round(lon * COORD_SCALE))
+
+
+def build(out_path: str = OUT_PATH) -> str:
+    import zipcodes
+
+    zips = {}
+    cities = defaultdict(list)
+    for z in zipcodes.list_all():
+        try:
+            lat, lon = float(z["lat"]), float(z["long"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if not z.get("zip_code", "").isdigit() or (lat == 0 and lon == 0):
+            continue
+
+        zips[int(z["zip_code"])] = (lat, lon)
+        if z.get("city") and z.get("state"):
+            cities[city_key_hash(city_key(z["city"], z["state"]))].append((lat, lon))
+
+    zip_ids = array("I", sorted(zips))
+    zip_xy = array("h")
+    for zc in zip_ids:
+        zip_xy.extend(_xy(*zips[zc]))
+
+    city_ids = array("Q", sorted(cities))
+    city_xy = array("h")
+    for h in city_ids:
+        pts = cities[h]
+        city_xy.extend(_xy(sum(p[0] for p in pts) / len(pts), sum(p[1] for p in pts) / len(pts)))
+
+    if sys.byteorder != "little":
+        for arr in (zip_ids, zip_xy, city_ids, city_xy):
+            arr.byteswap()
+
+    header = MAGIC + struct.pack("<HHII", VERSION, 0, len(zip_ids), len(city_ids))
+    assert len(header) == HEADER_SIZE
+
+    with open(out_path, "wb") as f:
+        f.write(header)
+        for arr in (zip_ids, zip_xy, city_ids, city_xy):
+            arr.tofile(f)
+
+    print(f"Wrote {out_path}: {len(zip_ids)} ZIPs, {len(city_ids)} cities, {os.path.getsize(out_path)} bytes")
+    return out_path
+
+
+if __name__ == "__main__":
+    build()
@@ -1,4 +1,5 @@
 import os
+from sqlalchemy import inspect, text
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
 from dotenv import load_dotenv
@@ -10,13 +11,18 @@ DB_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./bot_database.db")
 
 # 1. High-Speed Engine Configuration 🚀
 # Biz bu yerda pooling sozlamalarini qo'shdik, shunda bot 10x tezroq javob beradi.
+# SQLite (lokal) pool_size/max_overflow-ni qabul qilmaydi, ular faqat server DB uchun
+POOL_KWARGS = {} if DB_URL.startswith("sqlite") else {
+    "pool_size": 10,          # Bir vaqtning o'zida 10 ta ulanish tayyor turadi
+    "max_overflow": 20,       # Zarur bo'lsa yana 20 ta qo'shimcha ulanish ochiladi
+}
+
 engine = create_async_engine(
     DB_URL, 
     echo=False,
-    pool_size=10,             # Bir vaqtning o'zida 10 ta ulanish tayyor turadi
-    max_overflow=20,          # Zarur bo'lsa yana 20 ta qo'shimcha ulanish ochiladi
     pool_pre_ping=True,       # Ulanish o'lib qolmaganini doim tekshirib turadi
-    pool_recycle=3600         # Har soatda ulanishlarni yangilab turadi
+    pool_recycle=3600,        # Har soatda ulanishlarni yangilab turadi
+    **POOL_KWARGS
 )
 
 # 2. Session Factory
@@ -35,4 +41,21 @@ async def init_db():
     # Alice o'z xotirasini bot ishga tushgan zahoti tayyorlaydi 🥱
     async with engine.begin() as conn:
         # Bu qator jadvallarni (User modeli kabi) avtomatik yaratadi
-        await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
+        await conn.run_sync(Base.metadata.create_all)
+        # create_all mavjud jadvalga yangi ustun qo'shmaydi — pdf_jobs uchun buni o'zimiz qilamiz.
+        # main.py ham, worker.py ham shu yerdan o'tadi, qaysi biri birinchi ishga tushishidan qat'i nazar
+        await conn.run_sync(_add_missing_columns, ("pdf_jobs",))
+
+
+def _add_missing_columns(sync_conn, table_names):
+    """Modelda bor, lekin bazada yo'q ustunlarni ALTER TABLE ... ADD COLUMN bilan qo'shadi (SQLite va Postgres)."""
+    inspector = inspect(sync_conn)
+    for name in table_names:
+        table = Base.metadata.tables.get(name)
+        if table is None or not inspector.has_table(name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=sync_conn.dialect)
+                sync_conn.execute(text(f"ALTER TABLE {name} ADD COLUMN {column.name} {column_type}"))
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, Text, Date
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, Text, Date, Float
 from datetime import datetime, date
 from .connection import Base
 
@@ -24,4 +24,72 @@ class User(Base):
 
     def __repr__(self):
         status = "PRO" if self.is_pro else "FREE"
-        return f"<User {self.tg_id} ({status}) - {self.weekly_requests}/5 RCs used this week>"
\ No newline at end of file
+        return f"<User {self.tg_id} ({status}) - {self.weekly_requests}/5 RCs used this week>"
+
+
+class ExtractionCache(Base):
+    """analyze_text()/finish_extraction() output keyed by a hash of the normalized RC text. 🧠"""
+    __tablename__ = "extraction_cache"
+
+    id = Column(Integer, primary_key=True)
+    text_hash = Column(String(64), unique=True, nullable=False, index=True)
+    payload = Column(Text, nullable=False)  # JSON
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class GeocodeCache(Base):
+    """Normalized address -> (lat, lon). lat/lon are NULL for addresses Nominatim can't resolve. 🗺️"""
+    __tablename__ = "geocode_cache"
+
+    id = Column(Integer, primary_key=True)
+    address_key = Column(String(512), unique=True, nullable=False, index=True)
+    lat = Column(Float, nullable=True)
+    lon = Column(Float, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class RouteCache(Base):
+    """Routed road miles for one directed leg, keyed by rounded origin/destination coordinates. 🛣️"""
+    __tablename__ = "route_cache"
+
+    id = Column(Integer, primary_key=True)
+    leg_key = Column(String(64), unique=True, nullable=False, index=True)
+    miles = Column(Float, nullable=False)
+    hits = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class PdfJob(Base):
+    """One uploaded PDF, persisted so queued/running work survives restarts. 📮"""
+    __tablename__ = "pdf_jobs"
+
+    id = Column(Integer, primary_key=True)
+    tg_id = Column(BigInteger, nullable=False, index=True)
+    chat_id = Column(BigInteger, nullable=False)
+    file_id = Column(String(256), nullable=False)
+    file_unique_id = Column(String(128), nullable=True)
+    file_size = Column(Integer, default=0)
+    status_msg_id = Column(BigInteger, nullable=False)
+    reply_to_id = Column(BigInteger, nullable=False)
+    priority = Column(String(16), default="pro")
+
+    # queued -> running -> done, or retry (waiting for next_attempt_at) / dead after the last attempt.
+    # With JOB_QUEUE_MODE=shared a worker finishes at "ready" and the polling process
+    # sends result_text, then marks the job done ("undeliverable" if Telegram keeps refusing it)
+    state = Column(String(16), default="queued", nullable=False, index=True)
+    stage = Column(String(16), nullable=True)          # last pipeline stage reached
+    worker = Column(String(64), nullable=True)         # host:pid of the worker that claimed it
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text, nullable=True)
+    result_ref = Column(String(64), nullable=True)     # extraction_cache.text_hash of the answer
+    result_text = Column(Text, nullable=True)          # rendered reply, waiting to be sent (cleared once it is)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    delivered_at = Column(DateTime, nullable=True)     # result (or final error) sent to the user
+    delivery_attempts = Column(Integer, default=0)     # failed sends of result_text (shared mode)
+    next_attempt_at = Column(DateTime, nullable=True)
@@ -13,6 +13,8 @@ from sqlalchemy import select, update, func
 from database.connection import AsyncSessionLocal
 from database.models import User
 from config import ADMIN_IDS
+from services import result_cache, geocoder, route_cache, prompt_compactor, job_store
+from handlers.processor import pipeline_stats, outbox
 
 router = Router()
 
@@ -204,11 +206,28 @@ async def show_stats(callback: types.CallbackQuery):
     async with AsyncSessionLocal() as session:
         total_res = await session.execute(select(func.count(User.id)))
         pro_res = await session.execute(select(func.count(User.id)).where(User.is_pro == True))
-        
+        jobs = await job_store.counts()
+
         text = (
             "📊 <b>Lazy Alice Empire Stats</b>\n\n"
             f"👥 Total Users: <b>{total_res.scalar()}</b>\n"
             f"💎 Pro Users: <b>{pro_res.scalar()}</b>\n\n"
+            f"⚡ Extraction cache: <b>{result_cache.stats['hits']}</b> hits / "
+            f"<b>{result_cache.stats['misses']}</b> misses\n"
+            f"🗺️ Geocode cache: <b>{geocoder.stats['hits']}</b> hits / "
+            f"<b>{geocoder.stats['misses']}</b> misses\n"
+            f"🛣️ Route cache: <b>{route_cache.stats['hits']}</b> leg hits / "
+            f"<b>{route_cache.stats['misses']}</b> misses\n"
+            f"✂️ Prompt tokens saved: <b>~{prompt_compactor.stats['tokens_in'] - prompt_compactor.stats['tokens_out']}</b> "
+            f"over <b>{prompt_compactor.stats['docs']}</b> docs\n"
+            "🏭 Pipeline: " + ", ".join(
+                f"{name} <b>{s['active']}</b>+{s['queued']}" for name, s in pipeline_stats().items()
+            ) + "\n"
+            f"📦 Jobs: <b>{jobs.get('queued', 0)}</b> queued, <b>{jobs.get('done', 0)}</b> done, "
+            f"{jobs.get('retry', 0)} retrying, "
+            f"<b>{jobs.get('dead', 0)}</b> dead, {jobs.get('undeliverable', 0)} undeliverable\n"
+            f"📤 Telegram outbox: <b>{outbox.stats()['inflight']}</b> in flight, "
+            f"{outbox.stats()['queued']} queued\n\n"
             "Business is booming, honey. 🥱💅"
         )
         await callback.message.answer(text, parse_mode="HTML")
@@ -2,13 +2,13 @@ import time
 import logging
 import asyncio
 import html
-import httpx
 
 from aiogram import Router, types, F, Bot
 from aiogram.enums import ChatType
 from aiogram.exceptions import TelegramRetryAfter
 
 from config import DEEPSEEK_API_KEY, DEEPSEEK_URL
+from services.http_client import get_client
 
 router = Router()
 logger = logging.getLogger("LazyAlice.Chat")
@@ -57,19 +57,19 @@ async def deepseek_chat(user_text: str) -> str:
         "max_tokens": MAX_REPLY_TOKENS,
     }
 
-    async with httpx.AsyncClient() as client:
-        r = await client.post(
-            DEEPSEEK_URL,
-            headers={
-                "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json=payload,
-            timeout=30.0,
-        )
-        r.raise_for_status()
-        data = r.json()
-        return (data["choices"][0]["message"]["content"] or "").strip() or "🥱"
+    client = get_client("deepseek")
+    r = await client.post(
+        DEEPSEEK_URL,
+        headers={
+            "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
+            "Content-Type": "application/json",
+        },
+        json=payload,
+        timeout=30.0,
+    )
+    r.raise_for_status()
+    data = r.json()
+    return (data["choices"][0]["message"]["content"] or "").strip() or "🥱"
 
 
 async def _should_answer_in_group(message: types.Message, bot: Bot) -> tuple[bool, str]:
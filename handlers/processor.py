@@ -1,92 +1,166 @@
 import os
+import html
+import json
+import time
+import socket
+import dataclasses
 import tempfile
 import asyncio
 import logging
-from datetime import date, datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
+from dataclasses import dataclass, field
 from typing import Dict, Any, Callable, Awaitable, Optional
 
 from aiogram import Router, types, F, Bot
 from aiogram.enums import ParseMode
-from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest, TelegramForbiddenError
 from sqlalchemy import select
 
-from config import ADMIN_IDS
+from config import (
+    ADMIN_IDS, MAX_PDF_SIZE_MB, PDF_SPOOL_THRESHOLD_MB,
+    DOWNLOAD_CONCURRENCY, PROCESS_CONCURRENCY, ANALYZE_CONCURRENCY, MILEAGE_CONCURRENCY, SEND_CONCURRENCY,
+    SCHEDULER_WORKERS, MAX_INFLIGHT_PER_USER, PRIORITY_WEIGHTS, JOB_QUEUE_MODE,
+    TG_GLOBAL_RATE, TG_CHAT_RATE, TG_CHAT_BURST, TG_GROUP_PER_MINUTE, JOB_WORKERS,
+)
 from database.connection import AsyncSessionLocal
 from database.models import User
-from services.pdf_engine import extract_text_async
-from services.extractor import smart_extract
+from services.pdf_engine import PdfSource, extract_text_async, cached_text_for_file
+from services.extractor import Extraction, analyze_text, finish_extraction
 from services.renderer import render_result
+from services import job_store
+from utils.scheduler import FairScheduler
+from utils import tg_outbox
+from utils.tg_outbox import TelegramOutbox
 
 
 logger = logging.getLogger("LazyAlice.Processor")
 router = Router()
 
 # ================= GLOBALS =================
-user_queues: Dict[int, asyncio.Queue] = {}
-user_workers: Dict[int, asyncio.Task] = {}
 media_group_tracker: Dict[str, int] = {}
 
 MEDIA_GROUP_LIMIT = 5
 
-# Semaphores to keep Railway RAM usage stable 💅
-GLOBAL_PROCESS_SEM = asyncio.Semaphore(1)  # Only 1 OCR/AI task at a time to prevent RAM spikes
-TG_SEND_SEM = asyncio.Semaphore(1)
+# Work is split into stage pools (see PIPELINE below); OCR itself runs in a
+# bounded process pool (services/pdf_engine.py), so RAM stays stable 💅
+#
+# JOB_QUEUE_MODE=shared: worker.py processes pick jobs up from pdf_jobs,
+# the polling process only takes uploads and sends the results
+SHARED_QUEUE = JOB_QUEUE_MODE == "shared"
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
 
 
 # ================= TELEGRAM SAFE CALL =================
-async def tg_call_with_retry(
-    factory: Callable[[], Awaitable[Any]],
-    *,
-    max_retries: int = 6,
-) -> Any:
-    last_exc: Optional[Exception] = None
-
-    for _ in range(max_retries):
-        try:
-            async with TG_SEND_SEM:
-                return await factory()
-        except TelegramRetryAfter as e:
-            last_exc = e
-            await asyncio.sleep(int(getattr(e, "retry_after", 1)) + 1)
-        except Exception as e:
-            last_exc = e
-            await asyncio.sleep(1)
-
-    if last_exc:
-        raise last_exc
-    return await factory()
+# Paced per chat / per group / globally; different chats go out in parallel.
+# Shared mode: the polling process and every worker.py have their own outbox,
+# so each gets an equal share of the bot-wide limit
+outbox = TelegramOutbox(
+    global_rate=TG_GLOBAL_RATE / (JOB_WORKERS + 1) if SHARED_QUEUE else TG_GLOBAL_RATE,
+    chat_rate=TG_CHAT_RATE,
+    chat_burst=TG_CHAT_BURST,
+    group_rate=TG_GROUP_PER_MINUTE / 60,
+)
 
 
 async def safe_send(bot: Bot, **kwargs):
-    return await tg_call_with_retry(lambda: bot.send_message(**kwargs))
+    return await outbox.call(kwargs["chat_id"], lambda: bot.send_message(**kwargs), priority=tg_outbox.RESULT)
 
 
-async def safe_edit(bot: Bot, chat_id: int, message_id: int, text: str):
-    async def _call():
-        return await bot.edit_message_text(
-            chat_id=chat_id,
-            message_id=message_id,
-            text=text,
-            parse_mode=ParseMode.HTML,
-        )
+def _edit(bot: Bot, chat_id: int, message_id: int, text: str) -> asyncio.Future:
+    return outbox.submit(
+        chat_id,
+        lambda: bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, parse_mode=ParseMode.HTML),
+        priority=tg_outbox.EDIT,
+        key=(chat_id, message_id),
+    )
+
 
+async def safe_edit(bot: Bot, chat_id: int, message_id: int, text: str):
     try:
-        return await tg_call_with_retry(_call)
-    except TelegramBadRequest as e:
-        if "message is not modified" in str(e).lower():
-            return None
+        return await asyncio.shield(_edit(bot, chat_id, message_id, text))
+    except TelegramBadRequest:
+        # "message is not modified" / already deleted
+        return None
+    except TelegramAPIError as e:
+        # Bot blocked, or the outbox gave up after its retries: a status line isn't worth failing a job over
+        logger.warning("Status edit in chat %s dropped: %s", chat_id, e)
         return None
 
 
+def post_status(job: "Job", text: str):
+    """Status edit without waiting for it: the pipeline never blocks on a chat's rate limit."""
+    _edit(job.bot, job.chat_id, job.status_msg_id, text)
+
+
+def _delete(bot: Bot, chat_id: int, message_id: int) -> asyncio.Future:
+    return outbox.submit(
+        chat_id,
+        lambda: bot.delete_message(chat_id=chat_id, message_id=message_id),
+        priority=tg_outbox.DELETE,
+        key=(chat_id, message_id),
+    )
+
+
 async def safe_delete(bot: Bot, chat_id: int, message_id: int):
     try:
-        return await tg_call_with_retry(
-            lambda: bot.delete_message(chat_id=chat_id, message_id=message_id)
-        )
+        return await asyncio.shield(_delete(bot, chat_id, message_id))
     except Exception:
         return None
 
 
+# ================= DOWNLOAD =================
+async def download_pdf(bot: Bot, file_id: str, file_size: Optional[int]) -> PdfSource:
+    """
+    Small PDFs stay in memory end to end (pdfplumber/pdf2image read bytes).
+    Big ones are streamed to ./temp in chunks and handed over by path.
+    """
+    tg_file = await bot.get_file(file_id)
+    size = file_size or tg_file.file_size or 0
+
+    if size <= PDF_SPOOL_THRESHOLD_MB * 1024 * 1024:
+        buf = await bot.download_file(tg_file.file_path)
+        return buf.getvalue()
+
+    os.makedirs("temp", exist_ok=True)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf", dir="temp") as tmp:
+        tmp_path = tmp.name
+    try:
+        await bot.download_file(tg_file.file_path, destination=tmp_path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return tmp_path
+
+
+# ================= PROGRESS =================
+# Telegram allows roughly one edit per second per chat; stream updates are batched
+PROGRESS_EDIT_INTERVAL = 1.5
+
+
+def progress_text(partial: Dict[str, Any]) -> str:
+    """Status message while DeepSeek is still writing: what's been found so far."""
+    lines = ["🧠 <b>Analyzing...</b>"]
+    if broker := partial.get("broker"):
+        lines.append(f"🏢 {html.escape(str(broker))}")
+    if load := partial.get("load_number"):
+        lines.append(f"📦 Load# <code>{html.escape(str(load))}</code>")
+    pickups, deliveries = len(partial.get("pickups", [])), len(partial.get("deliveries", []))
+    if pickups or deliveries:
+        lines.append(f"📍 {pickups} pickup(s), {deliveries} delivery(ies) so far")
+    return "\n".join(lines)
+
+
+async def report_progress(bot: Bot, chat_id: int, message_id: int, progress: Dict[str, str]):
+    """Edits the status message with the latest progress["text"]; cancelled when analysis ends."""
+    shown = None
+    while True:
+        await asyncio.sleep(PROGRESS_EDIT_INTERVAL)
+        text = progress.get("text")
+        if text and text != shown:
+            await safe_edit(bot, chat_id, message_id, text)
+            shown = text
+
+
 # ================= ACCESS CHECK (PAID ONLY MODE) =================
 async def check_is_paid_user(uid: int) -> bool:
     """
@@ -117,88 +191,407 @@ async def check_is_paid_user(uid: int) -> bool:
         return False
 
 
-# ================= WORKER =================
-async def process_user_queue(uid: int, bot: Bot):
-    q = user_queues.get(uid)
-    if not q:
-        return
-
-    logger.info("🚀 Worker started for %s", uid)
+# ================= PIPELINE =================
+@dataclass(eq=False)
+class Job:
+    """One PDF on its way through the stages."""
+    bot: Bot
+    uid: int
+    chat_id: int
+    file_id: str
+    file_unique_id: Optional[str]
+    file_size: int
+    status_msg_id: int
+    reply_to_id: int
+    source: Optional[PdfSource] = None
+    text: Optional[str] = None
+    extraction: Optional[Extraction] = None
+    position: int = 0
+    priority: str = "pro"
+    job_id: Optional[int] = None   # row in pdf_jobs (None if the database was unavailable)
+    attempts: int = 0
+    queued_at: float = 0.0         # epoch seconds the upload was accepted
+    timings: Dict[str, float] = field(default_factory=dict)   # seconds per stage, this attempt
+    done: asyncio.Future = field(default_factory=lambda: asyncio.get_running_loop().create_future())
+
+
+class Stage:
+    """
+    A queue plus a fixed number of workers. A job that finishes here moves on
+    to `next`; a failure is retried or dead-lettered (fail_job). Stages are sized
+    independently, so OCR (CPU) and DeepSeek/routing (network) overlap across jobs.
+    """
 
-    try:
+    def __init__(self, name: str, concurrency: int, handler: Callable[[Job], Awaitable[None]]):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.handler = handler
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.next: Optional["Stage"] = None
+        self.active = 0
+        self._workers: list = []
+
+    def start(self):
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(self, job: Job):
+        await self.queue.put(job)
+
+    async def _worker(self):
         while True:
+            job = await self.queue.get()
+            self.active += 1
+            started = time.time()
+            moved_on = False
+            if not job.timings and job.queued_at:
+                job.timings["queue"] = started - job.queued_at
             try:
-                item = await asyncio.wait_for(q.get(), timeout=10)
-            except asyncio.TimeoutError:
-                if q.empty():
-                    break
-                continue
-
-            chat_id: int = item["chat_id"]
-            file_id: str = item["file_id"]
-            status_id: int = item["status_msg_id"]
-            reply_id: int = item["reply_to_id"]
-            tmp_path: Optional[str] = None
+                await job_store.mark_stage(job.job_id, self.name)
+                await self.handler(job)
+            except Exception as e:
+                logger.exception("%s stage failed for %s", self.name, job.uid)
+                job.timings[self.name] = time.time() - started
+                log_timing(job, "failed")
+                try:
+                    await fail_job(job, e)
+                except Exception:
+                    logger.exception("Could not fail job %s cleanly", job.job_id)
+            else:
+                job.timings[self.name] = time.time() - started
+                if self.next:
+                    await self.next.submit(job)
+                    moved_on = True
+                else:
+                    log_timing(job, "done")
+            finally:
+                self.active -= 1
+                self.queue.task_done()
+                # Unless it went on to the next stage, the job has left the pipeline:
+                # release its scheduler slot whatever happened above
+                if not moved_on and not job.done.done():
+                    job.done.set_result(None)
 
-            try:
-                await safe_edit(bot, chat_id, status_id, "📄 <b>Downloading...</b>")
 
-                tg_file = await bot.get_file(file_id)
-                raw = await bot.download_file(tg_file.file_path)
+def log_timing(job: Job, outcome: str):
+    """One line per attempt with the bot's own stage times (benchmarks/run_load.py --bot-log)."""
+    record = {"chat_id": job.chat_id, "reply_to_id": job.reply_to_id, "job_id": job.job_id,
+              "attempt": job.attempts + 1, "outcome": outcome}
+    record.update({name: round(seconds, 3) for name, seconds in job.timings.items()})
+    logger.info("⏱️ Job timing %s", json.dumps(record))
 
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-                    tmp.write(raw.read())
-                    tmp_path = tmp.name
 
-                async with GLOBAL_PROCESS_SEM:
-                    await safe_edit(bot, chat_id, status_id, "🔍 <b>Extracting...</b>")
-                    text = await extract_text_async(tmp_path)
+async def cleanup_job(job: Job, delete_status: bool = True):
+    if delete_status:
+        # Queued in the outbox; the job's scheduler slot doesn't wait for it
+        _delete(job.bot, job.chat_id, job.status_msg_id)
 
-                    await safe_edit(bot, chat_id, status_id, "🧠 <b>Analyzing...</b>")
-                    data = await smart_extract(text)
+    # Only spooled (large) PDFs live on disk
+    if isinstance(job.source, str) and os.path.exists(job.source):
+        try:
+            os.remove(job.source)
+        except Exception:
+            pass
 
-                async with AsyncSessionLocal() as session:
-                    res = await session.execute(select(User).where(User.tg_id == uid))
-                    user = res.scalar_one_or_none()
-                    template = user.template_text if user else None
+    if not job.done.done():
+        job.done.set_result(None)
 
-                formatted = render_result(data, template)
 
-                await safe_send(
-                    bot,
-                    chat_id=chat_id,
-                    text=formatted,
-                    reply_to_message_id=reply_id,
-                    parse_mode=ParseMode.HTML,
-                )
+def error_text(error: str) -> str:
+    return f"⚠️ <b>Error:</b>\n<code>{html.escape(error)}</code>"
 
-            except Exception as e:
-                logger.exception("Worker error for %s", uid)
-                try:
-                    await safe_send(
-                        bot,
-                        chat_id=chat_id,
-                        text=f"⚠️ <b>Error:</b>\n<code>{str(e)}</code>",
-                        reply_to_message_id=reply_id,
-                        parse_mode=ParseMode.HTML,
-                    )
-                except Exception:
-                    pass
 
-            finally:
-                await safe_delete(bot, chat_id, status_id)
+async def fail_job(job: Job, e: Exception):
+    """Schedules a retry with backoff; after the last attempt the job is dead and the user sees the error."""
+    job.attempts += 1
+    delay = await job_store.mark_failed(job.job_id, job.attempts, str(e) or type(e).__name__)
 
-                if tmp_path and os.path.exists(tmp_path):
-                    try:
-                        os.remove(tmp_path)
-                    except Exception:
-                        pass
+    if delay is not None:
+        logger.warning("Job %s attempt %d failed, retrying in %.0fs", job.job_id, job.attempts, delay)
+        await safe_edit(job.bot, job.chat_id, job.status_msg_id,
+                        f"⏳ <b>Hiccup, retrying in {delay:.0f}s...</b>")
+        await cleanup_job(job, delete_status=False)
+        if not SHARED_QUEUE:
+            # Shared mode: the row is claimable again once next_attempt_at passes
+            asyncio.create_task(requeue_later(job, delay))
+        return
 
-                q.task_done()
+    if SHARED_QUEUE:
+        # The polling process sends the error (see deliver_results)
+        return await cleanup_job(job, delete_status=False)
 
+    try:
+        await safe_send(
+            job.bot,
+            chat_id=job.chat_id,
+            text=error_text(str(e)),
+            reply_to_message_id=job.reply_to_id,
+            parse_mode=ParseMode.HTML,
+        )
+        await job_store.mark_delivered(job.job_id)
+    except Exception:
+        pass
+    await cleanup_job(job)
+
+
+async def requeue_later(job: Job, delay: float):
+    await asyncio.sleep(delay)
+    await enqueue(dataclasses.replace(
+        job, source=None, text=None, extraction=None, timings={},
+        done=asyncio.get_running_loop().create_future(),
+    ))
+
+
+async def download_stage(job: Job):
+    waiting_jobs.pop(id(job), None)
+    # Same RC forwarded again (driver, dispatcher, group)? Skip download + OCR.
+    job.text = await cached_text_for_file(job.file_unique_id)
+    if job.text is None:
+        post_status(job, "📄 <b>Downloading...</b>")
+        job.source = await download_pdf(job.bot, job.file_id, job.file_size)
+
+
+async def extract_stage(job: Job):
+    if job.text is None:
+        post_status(job, "🔍 <b>Extracting...</b>")
+        job.text = await extract_text_async(job.source, job.file_unique_id)
+
+
+async def analyze_stage(job: Job):
+    post_status(job, "🧠 <b>Analyzing...</b>")
+    progress: Dict[str, str] = {}
+    reporter = asyncio.create_task(report_progress(job.bot, job.chat_id, job.status_msg_id, progress))
+    try:
+        job.extraction = await analyze_text(
+            job.text, on_progress=lambda partial: progress.update(text=progress_text(partial))
+        )
     finally:
-        user_workers.pop(uid, None)
-        logger.info("💤 Worker stopped for %s", uid)
+        reporter.cancel()
+
+
+async def mileage_stage(job: Job):
+    if job.extraction.needs_mileage:
+        post_status(job, "🗺️ <b>Calculating miles...</b>")
+    # The offline estimate is instant; the routed figure replaces it in the result
+    await finish_extraction(
+        job.extraction,
+        on_estimate=lambda miles: post_status(job, f"🗺️ <b>~{miles:,.0f} mi (est.)</b>\n<i>Routing the exact miles...</i>"),
+    )
+
+
+async def send_stage(job: Job):
+    async with AsyncSessionLocal() as session:
+        res = await session.execute(select(User).where(User.tg_id == job.uid))
+        user = res.scalar_one_or_none()
+        template = user.template_text if user else None
+
+    formatted = render_result(job.extraction.data, template)
+
+    if SHARED_QUEUE:
+        await job_store.mark_ready(job.job_id, formatted, job.extraction.cache_key)
+        return await cleanup_job(job, delete_status=False)
+
+    try:
+        await safe_send(
+            job.bot,
+            chat_id=job.chat_id,
+            text=formatted,
+            reply_to_message_id=job.reply_to_id,
+            allow_sending_without_reply=True,
+            parse_mode=ParseMode.HTML,
+        )
+    except (TelegramForbiddenError, TelegramBadRequest) as e:
+        # Bot blocked, chat deleted, message rejected: running OCR and DeepSeek again won't help
+        logger.warning("Result for job %s is undeliverable: %s", job.job_id, e)
+        await job_store.mark_delivery_failed(job.job_id, 1, str(e), permanent=True)
+        return await cleanup_job(job, delete_status=False)
+    await job_store.mark_done(job.job_id, job.extraction.cache_key)
+    await cleanup_job(job)
+
+
+STAGES = [
+    Stage("download", DOWNLOAD_CONCURRENCY, download_stage),
+    Stage("extract", PROCESS_CONCURRENCY, extract_stage),
+    Stage("analyze", ANALYZE_CONCURRENCY, analyze_stage),
+    Stage("mileage", MILEAGE_CONCURRENCY, mileage_stage),
+    Stage("send", SEND_CONCURRENCY, send_stage),
+]
+for _stage, _next in zip(STAGES, STAGES[1:]):
+    _stage.next = _next
+
+
+def pipeline_stats() -> Dict[str, Dict[str, int]]:
+    return {s.name: {"queued": s.queue.qsize(), "active": s.active} for s in STAGES}
+
+
+# ================= SCHEDULER =================
+async def run_job(job: Job):
+    """A scheduler worker holds its slot until the job has left the pipeline."""
+    await STAGES[0].submit(job)
+    await job.done
+
+
+def priority_class(uid: int) -> str:
+    # Paid-only mode: everyone past the gate is Pro; "trial" is kept for when free trials return
+    return "admin" if uid in ADMIN_IDS else "pro"
+
+
+scheduler = FairScheduler(
+    run_job,
+    workers=SCHEDULER_WORKERS,
+    weights=PRIORITY_WEIGHTS,
+    per_user_cap=MAX_INFLIGHT_PER_USER,
+    default_class="pro",
+)
+
+# Waiting PDFs, so their "Queue position" can be kept current
+waiting_jobs: Dict[int, Job] = {}
+QUEUE_REFRESH_INTERVAL = 10
+
+
+async def enqueue(job: Job):
+    job.queued_at = job.queued_at or time.time()
+    waiting_jobs[id(job)] = job
+    await scheduler.submit(job.uid, job, job.priority)
+
+
+def job_from_row(bot: Bot, row) -> Job:
+    return Job(
+        bot=bot,
+        uid=row.tg_id,
+        chat_id=row.chat_id,
+        file_id=row.file_id,
+        file_unique_id=row.file_unique_id,
+        file_size=row.file_size or 0,
+        status_msg_id=row.status_msg_id,
+        reply_to_id=row.reply_to_id,
+        priority=row.priority or "pro",
+        job_id=row.id,
+        attempts=row.attempts or 0,
+        # created_at is naive UTC; the queue time then also covers retry backoff, as in local mode
+        queued_at=row.created_at.replace(tzinfo=timezone.utc).timestamp() if row.created_at else 0.0,
+    )
+
+
+async def resume_jobs(bot: Bot):
+    """Puts jobs a previous process left unfinished (redeploy, crash) back in the queue."""
+    jobs = await job_store.load_unfinished()
+    for row in jobs:
+        job = job_from_row(bot, row)
+        # Not awaited: a blocked bot or a Telegram outage must not abort startup
+        post_status(job, "♻️ <b>Back online, resuming...</b>")
+        delay = (row.next_attempt_at - datetime.utcnow()).total_seconds() if row.next_attempt_at else 0
+        if row.state == "retry" and delay > 0:
+            asyncio.create_task(requeue_later(job, delay))
+        else:
+            await enqueue(job)
+    if jobs:
+        logger.info("♻️ Resumed %d unfinished job(s)", len(jobs))
+
+
+def queued_text(position: int) -> str:
+    text = "👀 <b>Queued (Pro Access)</b>"
+    if position > 1:
+        text += f"\n📥 <i>Queue position: {position}</i>"
+    return text
+
+
+async def refresh_queue_positions():
+    """Moves everyone's "Queue position" up as jobs ahead of them start."""
+    while True:
+        await asyncio.sleep(QUEUE_REFRESH_INTERVAL)
+        positions = scheduler.positions()
+        for key, job in list(waiting_jobs.items()):
+            pos = positions.get(key)
+            if pos is None:
+                waiting_jobs.pop(key, None)
+            elif pos != job.position and waiting_jobs.get(key) is job:
+                # Still waiting right now (download_stage pops it): a late "Queued"
+                # edit must never replace "Downloading..." in the outbox
+                job.position = pos
+                post_status(job, queued_text(pos))
+
+
+# ================= SHARED QUEUE =================
+# Seconds between polls of pdf_jobs when there is nothing to claim / deliver
+WORKER_POLL_INTERVAL = 1.0
+RESULT_POLL_INTERVAL = 1.0
+
+
+async def claim_jobs(bot: Bot):
+    """worker.py: keeps the local scheduler fed from the shared queue, never more than it can run."""
+    logger.info("👷 Worker %s claiming jobs", WORKER_ID)
+    while True:
+        s = scheduler.stats()
+        free = SCHEDULER_WORKERS - s["running"] - s["waiting"]
+        rows = await job_store.claim(free, WORKER_ID, MAX_INFLIGHT_PER_USER)
+        for row in rows:
+            await scheduler.submit(row.tg_id, job_from_row(bot, row), row.priority)
+        if len(rows) < free or free <= 0:
+            await asyncio.sleep(WORKER_POLL_INTERVAL)
+
+
+async def deliver_one(bot: Bot, row) -> bool:
+    text = row.result_text if row.state == "ready" else error_text(row.last_error or "Processing failed")
+    attempts = (row.delivery_attempts or 0) + 1
+    try:
+        # The PDF message may be gone by now: then the reply is sent without the quote
+        await safe_send(bot, chat_id=row.chat_id, text=text, reply_to_message_id=row.reply_to_id,
+                        allow_sending_without_reply=True, parse_mode=ParseMode.HTML)
+    except (TelegramForbiddenError, TelegramBadRequest) as e:
+        # Bot blocked, chat deleted, message rejected: sending again won't help
+        logger.warning("Result for job %s is undeliverable: %s", row.id, e)
+        await job_store.mark_delivery_failed(row.id, attempts, str(e), permanent=True)
+        return False
+    except Exception as e:
+        logger.warning("Result for job %s not delivered yet (try %d): %s", row.id, attempts, e)
+        await job_store.mark_delivery_failed(row.id, attempts, str(e), permanent=False)
+        return False
+    await job_store.mark_delivered(row.id)
+    _delete(bot, row.chat_id, row.status_msg_id)
+    return True
+
+
+# Shared mode: job ids whose reply is being sent right now (skipped by the next poll)
+delivering: Dict[int, asyncio.Task] = {}
+
+
+async def deliver_results(bot: Bot):
+    """
+    Polling process in shared mode: sends what the workers finished. Every row
+    is its own task, so a chat stuck in a flood wait only delays its own reply.
+    """
+    while True:
+        rows = await job_store.pending_results(exclude=delivering.keys())
+        for row in rows:
+            task = asyncio.create_task(deliver_one(bot, row))
+            delivering[row.id] = task
+            task.add_done_callback(lambda _, job_id=row.id: delivering.pop(job_id, None))
+        if not rows:
+            await asyncio.sleep(RESULT_POLL_INTERVAL)
+
+
+def start_pipeline():
+    for stage in STAGES:
+        stage.start()
+    scheduler.start()
+    if not SHARED_QUEUE:
+        # Workers only see their own share of the queue, so positions are a front-end thing
+        asyncio.create_task(refresh_queue_positions())
+    logger.info("🏭 Pipeline started: %s", ", ".join(f"{s.name}×{s.concurrency}" for s in STAGES))
+
+
+async def stop_pipeline():
+    await scheduler.stop()
+    for stage in STAGES:
+        await stage.stop()
+    await outbox.stop()
 
 
 # ================= PDF HANDLER =================
@@ -218,6 +611,15 @@ async def handle_pdf(message: types.Message, bot: Bot):
             parse_mode=ParseMode.HTML
         )
 
+    # Reject oversized files before anything is downloaded
+    file_size = message.document.file_size or 0
+    if file_size > MAX_PDF_SIZE_MB * 1024 * 1024:
+        return await message.reply(
+            f"🙄 This PDF is {file_size / (1024 * 1024):.1f} MB. "
+            f"I only read files up to {MAX_PDF_SIZE_MB:g} MB, honey. 💅",
+            parse_mode=ParseMode.HTML
+        )
+
     # Limit “send many at once” in media groups
     if mg_id:
         media_group_tracker[mg_id] = media_group_tracker.get(mg_id, 0) + 1
@@ -227,24 +629,47 @@ async def handle_pdf(message: types.Message, bot: Bot):
             return
         asyncio.create_task(_cleanup_media_group(mg_id))
 
-    user_queues.setdefault(uid, asyncio.Queue())
-    pos = user_queues[uid].qsize()
-
-    status_text = "👀 <b>Queued (Pro Access)</b>"
-    if pos > 0:
-        status_text += f"\n📥 <i>Queue position: {pos + 1}</i>"
-
-    status_msg = await message.reply(status_text, parse_mode=ParseMode.HTML)
-
-    await user_queues[uid].put({
-        "chat_id": message.chat.id,
-        "file_id": message.document.file_id,
-        "status_msg_id": status_msg.message_id,
-        "reply_to_id": message.message_id,
-    })
+    priority = priority_class(uid)
+    if SHARED_QUEUE:
+        position = await job_store.waiting_count() + 1
+    else:
+        position = scheduler.position_for_new(uid, priority)
+    status_msg = await outbox.call(
+        message.chat.id,
+        lambda: message.reply(queued_text(position), parse_mode=ParseMode.HTML),
+        priority=tg_outbox.RESULT,
+    )
+
+    job = Job(
+        bot=bot,
+        uid=uid,
+        chat_id=message.chat.id,
+        file_id=message.document.file_id,
+        file_unique_id=message.document.file_unique_id,
+        file_size=file_size,
+        status_msg_id=status_msg.message_id,
+        reply_to_id=message.message_id,
+        position=position,
+        priority=priority,
+    )
+    job.job_id = await job_store.create(
+        tg_id=uid,
+        chat_id=job.chat_id,
+        file_id=job.file_id,
+        file_unique_id=job.file_unique_id,
+        file_size=file_size,
+        status_msg_id=job.status_msg_id,
+        reply_to_id=job.reply_to_id,
+        priority=priority,
+    )
+    if SHARED_QUEUE:
+        # A worker.py process claims it from pdf_jobs
+        if job.job_id is None:
+            await safe_edit(bot, job.chat_id, job.status_msg_id,
+                            "⚠️ <b>Queue is unavailable right now.</b> Please send the PDF again in a minute.")
+        return
 
-    if uid not in user_workers or user_workers[uid].done():
-        user_workers[uid] = asyncio.create_task(process_user_queue(uid, bot))
+    await enqueue(job)
 
 
 async def _cleanup_media_group(mg_id: str):
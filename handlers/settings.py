@@ -1,5 +1,4 @@
 import os
-import httpx
 import logging
 from aiogram import Router, types, F
 from aiogram.filters import Command
@@ -10,6 +9,7 @@ from database.connection import AsyncSessionLocal
 from database.models import User
 from utils.states import SettingsStates
 from config import DEEPSEEK_API_KEY, DEEPSEEK_URL
+from services.http_client import get_client
 
 router = Router()
 logger = logging.getLogger("Settings")
@@ -41,29 +41,29 @@ USER EXAMPLE:
 
 OUTPUT ONLY THE CLEAN JINJA2 CODE:
 """
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                DEEPSEEK_URL,
-                headers={"Authorization": f"Bearer {DEEPSEEK_API_KEY}", "Content-Type": "application/json"},
-                json={
-                    "model": "deepseek-chat",
-                    "messages": [
-                        {"role": "system", "content": "You output only clean Jinja2 code based on examples."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "temperature": 0.1
-                },
-                timeout=30.0
-            )
-            result = response.json()
-            # Handle potential markdown code blocks in AI response
-            content = result['choices'][0]['message']['content'].strip()
-            clean_content = content.replace("```jinja2", "").replace("```html", "").replace("```", "").strip()
-            return clean_content
-        except Exception as e:
-            logger.error(f"AI Template Error: {e}")
-            return None
+    client = get_client("deepseek")
+    try:
+        response = await client.post(
+            DEEPSEEK_URL,
+            headers={"Authorization": f"Bearer {DEEPSEEK_API_KEY}", "Content-Type": "application/json"},
+            json={
+                "model": "deepseek-chat",
+                "messages": [
+                    {"role": "system", "content": "You output only clean Jinja2 code based on examples."},
+                    {"role": "user", "content": prompt}
+                ],
+                "temperature": 0.1
+            },
+            timeout=30.0
+        )
+        result = response.json()
+        # Handle potential markdown code blocks in AI response
+        content = result['choices'][0]['message']['content'].strip()
+        clean_content = content.replace("```jinja2", "").replace("```html", "").replace("```", "").strip()
+        return clean_content
+    except Exception as e:
+        logger.error(f"AI Template Error: {e}")
+        return None
 
 @router.message(Command("settings"))
 async def show_settings(message: types.Message):
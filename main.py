@@ -5,17 +5,24 @@ import time
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
 from aiogram.fsm.storage.memory import MemoryStorage
 from sqlalchemy import text
 
-from config import BOT_TOKEN
+from config import BOT_TOKEN, TELEGRAM_API_URL, JOB_QUEUE_MODE
 from database.connection import init_db, AsyncSessionLocal
 from handlers import admin, start, settings, billing, chat, processor
+from services.pdf_engine import start_ocr_pool, shutdown_ocr_pool
+from services import text_cache, result_cache, route_cache, job_store
+from services.http_client import init_http_clients, close_http_clients
 from utils.middlewares import SubscriptionMiddleware, ThrottlingMiddleware
 
 # Only what we actually use from processor
-from handlers.processor import media_group_tracker
+from handlers.processor import (
+    media_group_tracker, start_pipeline, stop_pipeline, resume_jobs, deliver_results,
+)
 
 # 1. Configure logging
 logging.basicConfig(
@@ -48,6 +55,16 @@ async def cleanup_temp_files():
                 except Exception as e:
                     logger.warning("Temp cleanup failed for %s: %s", f, e)
 
+        # Extracted-text cache (opt-in, TEXT_CACHE_TTL_HOURS); wiped here when it's off
+        try:
+            await asyncio.to_thread(text_cache.prune)
+        except Exception as e:
+            logger.warning("Text cache cleanup failed: %s", e)
+
+        await result_cache.prune()
+        await route_cache.prune()
+        await job_store.prune()
+
         await asyncio.sleep(43200)  # 12 hours
 
 
@@ -60,6 +77,13 @@ async def on_startup(bot: Bot):
     # Create base tables
     await init_db()
 
+    # OCR workers live in their own processes (in shared mode: inside worker.py)
+    if JOB_QUEUE_MODE != "shared":
+        start_ocr_pool()
+
+    # Pooled keep-alive clients for DeepSeek / Nominatim / OSRM
+    await init_http_clients()
+
     # --- AUTO-MIGRATION LOGIC (REVISED FOR WEEKLY LIMITS) ---
     async with AsyncSessionLocal() as session:
         try:
@@ -86,6 +110,17 @@ async def on_startup(bot: Bot):
             await session.rollback()
             logger.warning("Database sync note (might already be up to date): %s", e)
 
+    if JOB_QUEUE_MODE == "shared":
+        # worker.py processes do the extraction; this one only takes uploads and sends results
+        asyncio.create_task(deliver_results(bot))
+        logger.info("📮 Shared job queue: waiting for worker.py results")
+    else:
+        # Download / extract / analyze / mileage / send stage workers
+        start_pipeline()
+
+        # PDFs that were queued or mid-flight when the last process stopped
+        await resume_jobs(bot)
+
     # Background tasks
     asyncio.create_task(clear_media_tracker_periodic())
     asyncio.create_task(cleanup_temp_files())
@@ -93,15 +128,26 @@ async def on_startup(bot: Bot):
     logger.info("Alice is fully awake and enforcing weekly limits. 💅")
 
 
+async def on_shutdown(bot: Bot):
+    await stop_pipeline()
+    await close_http_clients()
+    logger.info("HTTP clients closed.")
+
+
 async def main():
+    # Custom Bot API server (local telegram-bot-api, or the load-test fake)
+    session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)) if TELEGRAM_API_URL else None
+
     bot = Bot(
         token=BOT_TOKEN,
+        session=session,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
 
     dp = Dispatcher(storage=MemoryStorage())
 
     dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
 
     # Middlewares
     dp.message.middleware(ThrottlingMiddleware())
@@ -124,6 +170,7 @@ async def main():
     except Exception as e:
         logger.error("Polling error: %s", e)
     finally:
+        shutdown_ocr_pool()
         await bot.session.close()
         logger.info("Alice is going back to sleep. 🥱💤")
 
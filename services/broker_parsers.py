@@ -0,0 +1,180 @@
+import os
+import re
+import json
+import logging
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger("BrokerParsers")
+
+# --- Known broker layouts skip the LLM entirely ⚡ ---
+
+# Minimum parser confidence to trust it over DeepSeek
+PARSER_MIN_CONFIDENCE = float(os.getenv("PARSER_MIN_CONFIDENCE", "0.8"))
+# Declarative layouts for RegexLayoutParser, see its docstring. None ship yet: a layout
+# has to be written against real pdfplumber layout=True text of that broker's RCs.
+BROKER_LAYOUTS_PATH = os.getenv(
+    "BROKER_LAYOUTS_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "broker_layouts.json"),
+)
+
+PICKUP_KIND_RE = re.compile(r"pick|shipper|origin|\bpu\b", re.I)
+REQUIRED_FIELDS = ("load_number", "rate", "pickups", "deliveries")
+OPTIONAL_FIELDS = ("weight", "pu_number", "del_number", "bol_number", "ref_number")
+
+# What the model writes when it found nothing (or copied the example schema)
+PLACEHOLDERS = {"", "N/A", "NONE", "NULL", "ID", "0", "0.00", "COMPANY NAME ONLY", "FULL ADDRESS"}
+
+
+def is_filled(data: dict, field: str) -> bool:
+    value = data.get(field)
+    if field in ("pickups", "deliveries"):
+        return bool(value) and all(
+            isinstance(s, dict) and str(s.get("address") or "").strip().upper() not in PLACEHOLDERS for s in value
+        )
+    return value is not None and str(value).strip().upper() not in PLACEHOLDERS
+
+
+def completeness(data: dict) -> float:
+    """Share of the schema filled: required fields weigh 80%, optional refs/weight 20%."""
+    required = sum(is_filled(data, f) for f in REQUIRED_FIELDS) / len(REQUIRED_FIELDS)
+    optional = sum(is_filled(data, f) for f in OPTIONAL_FIELDS) / len(OPTIONAL_FIELDS)
+    # Refs/weight only count once stops, load # and rate are all there
+    return 0.8 * required + (0.2 * optional if required == 1 else 0.0)
+
+
+class BrokerParser(ABC):
+    """
+    One broker's fixed RC layout. `fingerprint()` says how sure we are the
+    document is theirs (0..1); `parse()` returns the same schema as
+    deepseek_ai_extract. Register instances with register_parser().
+    """
+    name = "base"
+
+    @abstractmethod
+    def fingerprint(self, text: str) -> float:
+        ...
+
+    @abstractmethod
+    def parse(self, text: str) -> dict:
+        ...
+
+    def expected_stops(self, text: str) -> Optional[int]:
+        """How many stops the document announces (e.g. "Stop N" headers), or None if unknown."""
+        return None
+
+
+class RegexLayoutParser(BrokerParser):
+    """
+    Regex-driven parser built from a layout spec (all patterns are case-insensitive, multiline):
+
+        {"broker": "Acme Logistics",
+         "fingerprints": ["ACME LOGISTICS", "Carrier Load Confirmation"],
+         "fields": {"load_number": "Load\\s*#:\\s*(\\S+)", "rate": "Total:\\s*\\$([\\d,.]+)", ...},
+         "stops": "^[ \\t]*(?P<kind>Pickup|Delivery)\\s+(?P<facility>.+)\\n(?P<address>.+)\\n(?P<time>[\\d/]+ [\\d:]+)",
+         "stop_headers": "^[ \\t]*(?:Pickup|Delivery)\\b"}
+
+    Field patterns use their first group. Stop matches become pickups or
+    deliveries by their `kind` group, in document order. `stop_headers`
+    matches once per stop the document has: a parse that found a different
+    number of stops is rejected. pdfplumber's layout=True output indents
+    lines, so anchored patterns must allow leading whitespace.
+    """
+
+    def __init__(self, spec: dict):
+        self.name = spec["broker"]
+        self.fingerprints = [re.compile(p, re.I | re.M) for p in spec["fingerprints"]]
+        self.fields = {k: re.compile(p, re.I | re.M) for k, p in spec.get("fields", {}).items()}
+        self.stops = re.compile(spec["stops"], re.I | re.M) if spec.get("stops") else None
+        self.stop_headers = re.compile(spec["stop_headers"], re.I | re.M) if spec.get("stop_headers") else None
+
+    def fingerprint(self, text: str) -> float:
+        if not self.fingerprints:
+            return 0.0
+        return sum(1 for p in self.fingerprints if p.search(text)) / len(self.fingerprints)
+
+    def parse(self, text: str) -> dict:
+        data = {"broker": self.name}
+        for field, pattern in self.fields.items():
+            if m := pattern.search(text):
+                data[field] = " ".join(m.group(1).split())
+
+        pickups, deliveries = [], []
+        for m in (self.stops.finditer(text) if self.stops else ()):
+            groups = m.groupdict()
+            stop = {k: " ".join((groups.get(k) or "").split()) or "N/A" for k in ("facility", "address", "time")}
+            (pickups if PICKUP_KIND_RE.search(groups.get("kind") or "") else deliveries).append(stop)
+        data["pickups"], data["deliveries"] = pickups, deliveries
+
+        for field in OPTIONAL_FIELDS:
+            data.setdefault(field, "N/A")
+        data.setdefault("total_miles", "0")
+        return data
+
+    def expected_stops(self, text: str) -> Optional[int]:
+        if not self.stop_headers:
+            return None
+        return len(self.stop_headers.findall(text))
+
+
+PARSERS: List[BrokerParser] = []
+
+
+def register_parser(parser: BrokerParser) -> BrokerParser:
+    PARSERS.append(parser)
+    return parser
+
+
+def load_layouts(path: str = BROKER_LAYOUTS_PATH) -> int:
+    """Registers a RegexLayoutParser per spec in the JSON file (a list of specs)."""
+    if not os.path.exists(path):
+        return 0
+    loaded = 0
+    try:
+        with open(path, encoding="utf-8") as f:
+            specs = json.load(f)
+    except Exception as e:
+        logger.error(f"❌ Broker layouts unreadable ({path}): {e}")
+        return 0
+    for spec in specs:
+        try:
+            register_parser(RegexLayoutParser(spec))
+            loaded += 1
+        except Exception as e:
+            logger.error(f"❌ Bad broker layout {spec.get('broker', '?')}: {e}")
+    logger.info(f"📚 Loaded {loaded} broker layout parser(s)")
+    return loaded
+
+
+def parse_known_broker(text: str, parsers: Optional[List[BrokerParser]] = None) -> Tuple[Optional[dict], float, Optional[str]]:
+    """
+    Best deterministic parse among parsers whose fingerprint matches.
+    Returns (data, confidence, parser name); data is None if nobody is
+    confident, and the caller falls back to DeepSeek.
+    """
+    best = (None, 0.0, None)
+    for parser in PARSERS if parsers is None else parsers:
+        try:
+            fp = parser.fingerprint(text)
+            if fp < 1.0:
+                continue
+            data = parser.parse(text)
+            expected = parser.expected_stops(text)
+        except Exception as e:
+            logger.error(f"❌ Parser {parser.name} failed: {e}")
+            continue
+        # A stop the pattern missed would go out as a wrong trip with wrong miles
+        found = len(data.get("pickups") or []) + len(data.get("deliveries") or [])
+        if expected is not None and found != expected:
+            logger.warning(f"⚠️ {parser.name} layout found {found} of {expected} stops, not trusting it")
+            continue
+        confidence = fp * completeness(data)
+        if confidence > best[1]:
+            best = (data, confidence, parser.name)
+
+    if best[1] < PARSER_MIN_CONFIDENCE:
+        return None, best[1], best[2]
+    return best
+
+
+load_layouts()
@@ -0,0 +1,176 @@
+import os
+import re
+import sys
+import math
+import mmap
+import hashlib
+import logging
+from bisect import bisect_left
+from typing import List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger("DistanceEstimator")
+
+Coords = Tuple[float, float]
+
+# Offline answer when Nominatim/OSRM are slow or down: ZIP (or City, ST)
+# centroid -> haversine -> times a road-circuity factor (~1.2 for US highways).
+CENTROIDS_PATH = os.getenv(
+    "CENTROIDS_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "us_centroids.bin"),
+)
+ROAD_CIRCUITY = float(os.getenv("ROAD_CIRCUITY", "1.2"))
+
+# File layout (little-endian), see data/build_centroids.py:
+#   header  : b"LZCT", u16 version, u16 reserved, u32 n_zip, u32 n_city
+#   zips    : u32[n_zip]       sorted 5-digit ZIPs
+#   zip_xy  : i16[2 * n_zip]   lat*100, lon*100
+#   cities  : u64[n_city]      sorted city_key_hash("CITY|ST")
+#   city_xy : i16[2 * n_city]  lat*100, lon*100
+MAGIC = b"LZCT"
+VERSION = 1
+HEADER_SIZE = 16
+COORD_SCALE = 100.0
+
+EARTH_RADIUS_MI = 3958.8
+
+US_STATES = {
+    "AL", "AK", "AZ", "AR", "CA", "CO", "CT", "DE", "DC", "FL", "GA", "HI", "ID", "IL", "IN",
+    "IA", "KS", "KY", "LA", "ME", "MD", "MA", "MI", "MN", "MS", "MO", "MT", "NE", "NV", "NH",
+    "NJ", "NM", "NY", "NC", "ND", "OH", "OK", "OR", "PA", "RI", "SC", "SD", "TN", "TX", "UT",
+    "VT", "VA", "WA", "WV", "WI", "WY", "PR",
+}
+
+STATE_ZIP_RE = re.compile(r"\b([A-Z]{2})[\s,]+(\d{5})(?:-\d{4})?\b")
+ZIP_TAIL_RE = re.compile(r"\b(\d{5})(?:-\d{4})?(?:[\s,]+(?:USA|US))?\s*$")
+# One comma-separated part: "TX", "TX 75201" or "DALLAS TX 75201"
+STATE_PART_RE = re.compile(r"^(?:(.*?)\s+)?([A-Z]{2})(?:\s+\d{5}(?:-\d{4})?)?$")
+
+
+def city_key(city: str, state: str) -> str:
+    city = re.sub(r"[.']", "", city.upper())
+    city = re.sub(r"\bSAINT\b", "ST", city)
+    city = re.sub(r"\bFORT\b", "FT", city)
+    return f"{' '.join(city.split())}|{state.upper()}"
+
+
+def city_key_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class CentroidTable:
+    """Read-only, memory-mapped ZIP/city centroid table. Lookups are binary searches; nothing is parsed up front."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mm)
+
+        if bytes(view[:4]) != MAGIC:
+            raise ValueError(f"{path} is not a centroid table")
+        header = view[4:HEADER_SIZE].cast("I") if sys.byteorder == "little" else None
+        if header is None:
+            raise ValueError("Centroid table needs a little-endian host")
+        version = header[0] & 0xFFFF
+        if version != VERSION:
+            raise ValueError(f"Unsupported centroid table version {version}")
+        n_zip, n_city = header[1], header[2]
+
+        off = HEADER_SIZE
+        self._zips = view[off:off + 4 * n_zip].cast("I")
+        off += 4 * n_zip
+        self._zip_xy = view[off:off + 4 * n_zip].cast("h")
+        off += 4 * n_zip
+        self._cities = view[off:off + 8 * n_city].cast("Q")
+        off += 8 * n_city
+        self._city_xy = view[off:off + 4 * n_city].cast("h")
+
+    @staticmethod
+    def _coords(xy, i: int) -> Coords:
+        return xy[2 * i] / COORD_SCALE, xy[2 * i + 1] / COORD_SCALE
+
+    def zip_coords(self, zip_code: str) -> Optional[Coords]:
+        z = int(zip_code)
+        i = bisect_left(self._zips, z)
+        if i < len(self._zips) and self._zips[i] == z:
+            return self._coords(self._zip_xy, i)
+
+        # Unknown/new ZIP: nearest known ZIP with the same 3-digit prefix
+        best = None
+        for j in (i - 1, i):
+            if 0 <= j < len(self._zips) and self._zips[j] // 100 == z // 100:
+                if best is None or abs(self._zips[j] - z) < abs(self._zips[best] - z):
+                    best = j
+        return self._coords(self._zip_xy, best) if best is not None else None
+
+    def city_coords(self, city: str, state: str) -> Optional[Coords]:
+        h = city_key_hash(city_key(city, state))
+        i = bisect_left(self._cities, h)
+        if i < len(self._cities) and self._cities[i] == h:
+            return self._coords(self._city_xy, i)
+        return None
+
+
+_table: Optional[CentroidTable] = None
+_table_failed = False
+
+
+def get_table() -> Optional[CentroidTable]:
+    global _table, _table_failed
+    if _table is None and not _table_failed:
+        try:
+            _table = CentroidTable(CENTROIDS_PATH)
+        except Exception as e:
+            _table_failed = True
+            logger.warning("Offline distance table unavailable: %s", e)
+    return _table
+
+
+def locate(addr: str) -> Optional[Coords]:
+    """Stop address -> approximate (lat, lon) from its ZIP, else its City, ST."""
+    table = get_table()
+    if table is None or not addr:
+        return None
+    text = " ".join(addr.upper().replace("\n", ", ").split())
+
+    # "TX 75201" is unambiguous; a bare 5-digit number only counts at the very end
+    # (otherwise it is probably a street number like "12345 Industrial Blvd")
+    candidates = [z for st, z in reversed(STATE_ZIP_RE.findall(text)) if st in US_STATES]
+    candidates += ZIP_TAIL_RE.findall(text)
+    for z in candidates:
+        if coords := table.zip_coords(z):
+            return coords
+
+    parts = [p.strip() for p in text.split(",")]
+    for i in range(len(parts) - 1, -1, -1):
+        m = STATE_PART_RE.match(parts[i])
+        if not m or m.group(2) not in US_STATES:
+            continue
+        city = m.group(1) or (parts[i - 1] if i > 0 else "")
+        # "100 MAIN ST DALLAS" -> longest trailing run of words that is a known city
+        words = re.sub(r"[^A-Z .'-]", " ", city).split()
+        for k in range(len(words)):
+            if coords := table.city_coords(" ".join(words[k:]), m.group(2)):
+                return coords
+    return None
+
+
+def haversine_miles(a: Coords, b: Coords) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MI * math.asin(math.sqrt(h))
+
+
+def estimate_trip_miles(addresses: List[str]) -> Optional[float]:
+    """
+    Instant road-mile estimate for PU1 -> DEL1 -> ... without any network call.
+    Stops that can't be located are skipped; None if fewer than two are known.
+    """
+    points = [c for c in (locate(a) for a in addresses) if c]
+    if len(points) < 2:
+        return None
+    crow = sum(haversine_miles(points[i], points[i + 1]) for i in range(len(points) - 1))
+    return round(crow * ROAD_CIRCUITY, 1)
@@ -1,23 +1,37 @@
 import os
 import re
 import json
-import httpx
+import asyncio
 import logging
+from dataclasses import dataclass
 from dotenv import load_dotenv
 
+from services import result_cache, route_cache
+from services.broker_parsers import is_filled, parse_known_broker
+from services.distance_estimator import estimate_trip_miles
+from services.geocoder import geocode, GEOCODE_DEADLINE_SECONDS
+from services.http_client import get_client
+from services.prompt_compactor import compact, excerpt
+from utils.json_stream import IncrementalJSONParser
+
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("Extractor")
 
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
-DEEPSEEK_URL = "https://api.deepseek.com/v1/chat/completions"
+DEEPSEEK_URL = os.getenv("DEEPSEEK_URL", "https://api.deepseek.com/v1/chat/completions")
 
 # 1. High-Performance Regex Patterns
 LOAD_RE = re.compile(r"(?:Load\s*Number|PRO\s*#|Load\s*#|Order\s*#|Reference\s*#)[:\s]*([0-9A-Z-]{5,15})", re.I)
 RATE_RE = re.compile(r"(?:Total\s*Rate|Total\s*Pay|Base\s*Rate|Rate)[:\s]*\$?\s*([\d,]+\.\d{2})", re.I)
 MILES_RE = re.compile(r"(?:Total\s*Miles|Distance|Miles)[:\s]*([\d.,]+)", re.I)
 
+# Routing (geocoding + OSRM) budget before falling back to the offline estimate
+MILEAGE_DEADLINE_SECONDS = float(os.getenv("MILEAGE_DEADLINE_SECONDS", "25"))
+# Whole streamed DeepSeek answer, first byte to last chunk
+DEEPSEEK_DEADLINE_SECONDS = float(os.getenv("DEEPSEEK_DEADLINE_SECONDS", "90"))
+
 async def extract_template_structure(system_prompt: str, user_example: str) -> str:
     """Alice smartly learns your style or appends notes to her default. 🧠💅"""
     
@@ -52,101 +66,145 @@ async def extract_template_structure(system_prompt: str, user_example: str) -> s
     # If it looks like a full template, let AI learn the skeleton as usual
     if not DEEPSEEK_API_KEY: return user_example
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                DEEPSEEK_URL,
-                headers={"Authorization": f"Bearer {DEEPSEEK_API_KEY}", "Content-Type": "application/json"},
-                json={
-                    "model": "deepseek-chat",
-                    "messages": [
-                        {"role": "system", "content": system_prompt + "\nReplace stops with {{ stops_info }}."},
-                        {"role": "user", "content": user_example}
-                    ],
-                    "temperature": 0.1
-                },
-                timeout=30.0
-            )
-            result = response.json()
-            skeleton = result['choices'][0]['message']['content'].strip()
-            return skeleton.replace("```jinja2", "").replace("```json", "").replace("```", "").strip()
-        except Exception as e:
-            logger.error(f"Template Extraction Error: {e}")
-            return user_example
-
-async def fetch_coords(addr, client):
-    """Cleanly constructed URL to avoid hidden formatting issues 👻"""
-    scheme = "https"
-    host = "nominatim.openstreetmap.org"
-    path = "/search"
-    
-    url = f"{scheme}://{host}{path}"
-    params = {
-        "q": addr,
-        "format": "json",
-        "limit": 1
-    }
-    
+    client = get_client("deepseek")
     try:
-        r = await client.get(
-            url, 
-            params=params, 
-            headers={"User-Agent": "LazyBot_Logistics/2.0"}, 
-            timeout=15
+        response = await client.post(
+            DEEPSEEK_URL,
+            headers={"Authorization": f"Bearer {DEEPSEEK_API_KEY}", "Content-Type": "application/json"},
+            json={
+                "model": "deepseek-chat",
+                "messages": [
+                    {"role": "system", "content": system_prompt + "\nReplace stops with {{ stops_info }}."},
+                    {"role": "user", "content": user_example}
+                ],
+                "temperature": 0.1
+            },
+            timeout=30.0
         )
-        if r.status_code == 200 and r.json():
-            lat = r.json()[0]["lat"]
-            lon = r.json()[0]["lon"]
-            return lat, lon
+        result = response.json()
+        skeleton = result['choices'][0]['message']['content'].strip()
+        return skeleton.replace("```jinja2", "").replace("```json", "").replace("```", "").strip()
     except Exception as e:
-        logger.error(f"❌ Geocoding Failed for {addr}: {e}")
+        logger.error(f"Template Extraction Error: {e}")
+        return user_example
+
+def clean_addr(addr: str, level: int = 0) -> str:
+    """Strip common facility noise and duplicate lines; higher levels keep only the tail (City, ST Zip)."""
+    addr = re.sub(r'^(?:FMC|JASPER|ARMSTRONG|PLANT \d+|DC|RESUPPLY|FPDC|WAREHOUSE|LOGISTICS|NAME:|ADDRESS:)\s+', '', addr, flags=re.I)
+    parts = [p.strip() for p in addr.replace('\n', ',').split(",") if p.strip()]
+    unique_parts = []
+    for p in parts:
+        if p not in unique_parts: unique_parts.append(p)
+
+    if level == 1 and len(unique_parts) > 2:
+        return ", ".join(unique_parts[-3:])
+    if level == 2 and len(unique_parts) >= 2:
+        return ", ".join(unique_parts[-2:])
+    return ", ".join(unique_parts)
+
+async def geocode_stop(addr: str):
+    """
+    Triple-fallback geocoding: full address, then the last 3 and last 2 parts 🗺️
+    All three attempts share one deadline.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + GEOCODE_DEADLINE_SECONDS
+    tried = set()
+    for level in range(3):
+        candidate = clean_addr(addr, level)
+        if not candidate or candidate in tried:
+            continue
+        tried.add(candidate)
+        left = deadline - loop.time()
+        if left <= 0:
+            break
+        if coords := await geocode(candidate, timeout=left):
+            return coords
     return None
 
-async def get_miles_free(origin: str, destination: str) -> str:
-    """Alice calculates distance with triple-fallback logic 🗺️"""
-    if not origin or not destination: return "N/A"
-    
-    def clean_addr(addr, level=0):
-        # Strip common facility noise and duplicate lines
-        addr = re.sub(r'^(?:FMC|JASPER|ARMSTRONG|PLANT \d+|DC|RESUPPLY|FPDC|WAREHOUSE|LOGISTICS|NAME:|ADDRESS:)\s+', '', addr, flags=re.I)
-        parts = [p.strip() for p in addr.replace('\n', ',').split(",") if p.strip()]
-        unique_parts = []
-        for p in parts:
-            if p not in unique_parts: unique_parts.append(p)
-            
-        if level == 1 and len(unique_parts) > 2:
-            return ", ".join(unique_parts[-3:]) 
-        if level == 2 and len(unique_parts) >= 2:
-            return ", ".join(unique_parts[-2:]) 
-        return ", ".join(unique_parts)
-
-    async with httpx.AsyncClient() as client:
-        o_coords = d_coords = None
-        for level in range(3):
-            if not o_coords: o_coords = await fetch_coords(clean_addr(origin, level), client)
-            if not d_coords: d_coords = await fetch_coords(clean_addr(destination, level), client)
-            if o_coords and d_coords: break
-
-        if o_coords and d_coords:
-            try:
-                osrm_scheme = "http"
-                osrm_host = "router.project-osrm.org"
-                osrm_path = f"/route/v1/driving/{o_coords[1]},{o_coords[0]};{d_coords[1]},{d_coords[0]}"
-                osrm_url = f"{osrm_scheme}://{osrm_host}{osrm_path}?overview=false"
-                
-                res = await client.get(osrm_url, timeout=10)
-                if res.status_code == 200:
-                    meters = res.json()["routes"][0]["distance"]
-                    return str(round(meters * 0.000621371, 1))
-            except Exception as e:
-                logger.error(f"❌ OSRM Route Error: {e}")
-                
-    return "N/A"
-
-async def deepseek_ai_extract(text: str) -> dict:
-    """AI handles the Broker Name, Weight, References, and ALL stops with high precision 🧠"""
+async def route_legs(points: list) -> list:
+    """
+    One OSRM request for the whole trip (/route/v1/driving/a;b;c;d), unless
+    every leg is already in the route cache.
+    Returns per-leg miles, or [] if routing failed.
+    """
+    if len(points) < 2:
+        return []
+    # Recurring lanes: every leg already routed before -> no OSRM call at all
+    if cached := await route_cache.get_legs(points):
+        return cached
+    try:
+        waypoints = ";".join(f"{lon},{lat}" for lat, lon in points)
+        osrm_url = f"http://router.project-osrm.org/route/v1/driving/{waypoints}?overview=false"
+
+        res = await get_client("osrm").get(osrm_url, timeout=10)
+        if res.status_code == 200:
+            legs = res.json()["routes"][0]["legs"]
+            miles = [round(leg["distance"] * 0.000621371, 1) for leg in legs]
+            await route_cache.put_legs(points, miles)
+            return miles
+        logger.error(f"❌ OSRM Route HTTP {res.status_code}")
+    except Exception as e:
+        logger.error(f"❌ OSRM Route Error: {e}")
+    return []
+
+async def get_trip_miles(addresses: list) -> str:
+    """
+    Alice geocodes every unique stop once and routes PU1 -> DEL1 -> DEL2 ...
+    in a single multi-waypoint request. Stops that can't be geocoded are
+    skipped, so the route goes straight to the next known stop. 🛣️
+    """
+    # All stops at once; the geocoder's shared rate limiter keeps us within Nominatim policy
+    unique = list(dict.fromkeys(a for a in addresses if a))
+    results = await asyncio.gather(*(geocode_stop(addr) for addr in unique))
+    coords_by_addr = dict(zip(unique, results))
+
+    stops = [(a, coords_by_addr[a]) for a in addresses if a and coords_by_addr.get(a)]
+    # Consecutive duplicates (same dock for PU and DEL1) would be a 0-mile leg
+    points = [c for i, (_, c) in enumerate(stops) if i == 0 or c != stops[i - 1][1]]
+
+    legs = await route_legs(points)
+    if not legs:
+        return "N/A"
+
+    for i, miles in enumerate(legs, 1):
+        logger.info(f"✅ Leg {i} Distance: {miles} mi")
+    return str(round(sum(legs), 1))
+
+async def get_mileage(addresses: list, on_estimate=None) -> tuple:
+    """
+    Routed miles if Nominatim/OSRM answer within MILEAGE_DEADLINE_SECONDS,
+    otherwise the offline ZIP/city estimate. Returns (miles, is_estimated). 📏
+    `on_estimate(miles)` gets the offline estimate right away, before routing starts.
+    """
+    estimate = estimate_trip_miles(addresses)
+    if estimate is not None:
+        logger.info(f"📏 Offline estimate: ~{estimate} mi")
+        if on_estimate:
+            on_estimate(estimate)
+
+    try:
+        routed = await asyncio.wait_for(get_trip_miles(addresses), MILEAGE_DEADLINE_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning(f"⏱️ Routing took over {MILEAGE_DEADLINE_SECONDS:.0f}s, using the offline estimate")
+        routed = "N/A"
+
+    if routed != "N/A":
+        return routed, False
+    if estimate is not None:
+        return str(estimate), True
+    return "N/A", False
+
+async def deepseek_ai_extract(text: str, on_event=None) -> dict:
+    """
+    AI handles the Broker Name, Weight, References, and ALL stops with high precision 🧠
+    The answer is streamed: `on_event(event)` gets every top-level field and every
+    pickup/delivery as soon as the model has written it (see utils/json_stream.py).
+    """
     if not DEEPSEEK_API_KEY: return None
-    
+
+    # Layout padding, repeated headers/footers and T&C text cost tokens and push stops past the budget
+    rc_text = compact(text).text
     prompt = f"""
 Analyze this US Logistics Rate Confirmation. RETURN ONLY VALID JSON.
 CRITICAL GUIDELINES:
@@ -173,34 +231,222 @@ Return JSON:
 }}
 
 TEXT:
-{text[:12000]}
+{rc_text}
 """
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                DEEPSEEK_URL, 
-                headers={"Authorization": f"Bearer {DEEPSEEK_API_KEY}", "Content-Type": "application/json"},
-                json={
-                    "model": "deepseek-chat",
-                    "messages": [
-                        {"role": "system", "content": "You are a US Logistics Specialist. You find all reference numbers, weights, and capture every single stop without exception."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "temperature": 0
-                },
-                timeout=60.0
-            )
-            content = response.json()['choices'][0]['message']['content']
-            clean_json = content.replace("```json", "").replace("```", "").strip()
-            return json.loads(clean_json)
-        except Exception as e:
-            logger.error(f"DeepSeek AI Error: {e}")
+    payload = {
+        "model": "deepseek-chat",
+        "messages": [
+            {"role": "system", "content": "You are a US Logistics Specialist. You find all reference numbers, weights, and capture every single stop without exception."},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0,
+        "stream": True,
+        "stream_options": {"include_usage": True}
+    }
+    try:
+        # The httpx timeout is per read: a slow trickle of chunks needs its own overall limit
+        content = await asyncio.wait_for(_stream_deepseek(payload, on_event), DEEPSEEK_DEADLINE_SECONDS)
+        if content is None:
             return None
+        clean_json = content.replace("```json", "").replace("```", "").strip()
+        return json.loads(clean_json)
+    except asyncio.TimeoutError:
+        logger.error(f"⏱️ DeepSeek AI took over {DEEPSEEK_DEADLINE_SECONDS:.0f}s, giving up")
+        return None
+    except Exception as e:
+        logger.error(f"DeepSeek AI Error: {e}")
+        return None
+
+
+async def _stream_deepseek(payload: dict, on_event=None):
+    """Streams one chat completion; returns the full answer text, or None on an HTTP error."""
+    client = get_client("deepseek")
+    parser = IncrementalJSONParser()
+    parts = []
+    async with client.stream(
+        "POST",
+        DEEPSEEK_URL,
+        headers={"Authorization": f"Bearer {DEEPSEEK_API_KEY}", "Content-Type": "application/json"},
+        json=payload,
+        timeout=60.0
+    ) as response:
+        if response.status_code != 200:
+            body = await response.aread()
+            logger.error(f"DeepSeek AI HTTP {response.status_code}: {body[:200]!r}")
+            return None
+
+        # Server-sent events: "data: {chunk}" lines, then "data: [DONE]"
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            chunk = json.loads(data)
+            if usage := chunk.get("usage"):
+                logger.info(f"🧾 DeepSeek usage: {usage.get('prompt_tokens')} prompt / {usage.get('completion_tokens')} completion tokens")
+            for choice in chunk.get("choices") or []:
+                delta = (choice.get("delta") or {}).get("content")
+                if not delta:
+                    continue
+                parts.append(delta)
+                for event in parser.feed(delta):
+                    if on_event:
+                        on_event(event)
+    return "".join(parts)
+
+# --- Targeted follow-up for fields the first pass left empty 🎯 ---
+
+# Token budget for the excerpt sent with a follow-up prompt
+FOLLOWUP_TOKEN_BUDGET = int(os.getenv("FOLLOWUP_TOKEN_BUDGET", "800"))
+
+# Fields worth a follow-up (refs are often genuinely absent), with the schema
+# to ask for and the lines likely to hold them
+FOLLOWUP_FIELDS = {
+    "broker": ('"broker": "Company Name Only"', r"broker|logistics|freight|transport|inc\b|llc\b|corp"),
+    "load_number": ('"load_number": "ID"', r"load|pro\s*#|order|confirmation|ref"),
+    "rate": ('"rate": "0.00"', r"rate|total|pay|linehaul|line\s*haul|amount|usd|\$"),
+    "weight": ('"weight": "N/A"', r"weight|lbs|pounds|\bkg\b|wt\b"),
+    "pickups": (
+        '"pickups": [{ "facility": "Name", "address": "Full Address", "time": "MM/DD/YYYY HH:MM" }]',
+        r"pick\s*-?\s*up|shipper|origin|\bpu\b",
+    ),
+    "deliveries": (
+        '"deliveries": [{ "facility": "Name", "address": "Full Address", "time": "MM/DD/YYYY HH:MM" }]',
+        r"deliver|consignee|receiver|destination|drop|\bso\b|stop\s*\d",
+    ),
+}
 
-async def smart_extract(text: str) -> dict:
+
+def missing_fields(data: dict) -> list:
+    return [f for f in FOLLOWUP_FIELDS if not is_filled(data, f)]
+
+
+async def refill_missing(text: str, data: dict, fields: list) -> list:
+    """
+    Asks DeepSeek again for just `fields`, showing only the lines around
+    their keywords. Fills `data` in place and returns the fields recovered.
+    """
+    pattern = re.compile("|".join(f"(?:{FOLLOWUP_FIELDS[f][1]})" for f in fields), re.I)
+    # The broker name usually sits in the letterhead
+    window = excerpt(text, pattern, FOLLOWUP_TOKEN_BUDGET, head=8 if "broker" in fields else 0)
+    if not window:
+        return []
+
+    schema = ",\n  ".join(FOLLOWUP_FIELDS[f][0] for f in fields)
+    prompt = f"""
+These fields are missing from a US Logistics Rate Confirmation extraction. Find them in the excerpt below.
+Use "N/A" for anything that is really not there. RETURN ONLY VALID JSON:
+{{
+  {schema}
+}}
+
+EXCERPT:
+{window}
+"""
+    try:
+        response = await get_client("deepseek").post(
+            DEEPSEEK_URL,
+            headers={"Authorization": f"Bearer {DEEPSEEK_API_KEY}", "Content-Type": "application/json"},
+            json={
+                "model": "deepseek-chat",
+                "messages": [
+                    {"role": "system", "content": "You are a US Logistics Specialist. You fill in missing load details precisely."},
+                    {"role": "user", "content": prompt}
+                ],
+                "temperature": 0
+            },
+            timeout=20.0
+        )
+        content = response.json()['choices'][0]['message']['content']
+        answer = json.loads(content.replace("```json", "").replace("```", "").strip())
+    except Exception as e:
+        logger.error(f"DeepSeek follow-up Error: {e}")
+        return []
+
+    if not isinstance(answer, dict):
+        logger.warning(f"DeepSeek follow-up returned {type(answer).__name__}, not an object; ignoring it")
+        return []
+
+    recovered = [
+        f for f in fields
+        if is_filled(answer, f)
+        # An excerpt must not shrink the stop list the full pass found
+        and not (f in ("pickups", "deliveries") and len(answer[f]) < len(data.get(f) or []))
+    ]
+    for f in recovered:
+        data[f] = answer[f]
+    return recovered
+
+
+# Geocoding started from the stream, ahead of get_mileage
+_warmups: set = set()
+
+async def stream_extract(text: str, on_progress=None) -> dict:
+    """
+    deepseek_ai_extract with early work: each stop starts geocoding the moment
+    the model has written it, so by the time the last delivery arrives most
+    coordinates are already cached (or in flight) for get_mileage.
+    """
+    partial = {}
+
+    def on_event(event):
+        kind, key, value = event
+        if kind == "item" and key in ("pickups", "deliveries"):
+            partial.setdefault(key, []).append(value)
+            if isinstance(value, dict) and value.get("address"):
+                task = asyncio.create_task(geocode_stop(value["address"]))
+                # Strong reference until done; the result lands in the geocode cache
+                _warmups.add(task)
+                task.add_done_callback(_warmups.discard)
+        elif kind == "field" and key not in ("pickups", "deliveries"):
+            partial[key] = value
+        else:
+            return
+        if on_progress:
+            on_progress(dict(partial))
+
+    return await deepseek_ai_extract(text, on_event)
+
+@dataclass
+class Extraction:
+    """analyze_text() result, handed to finish_extraction() (the pipeline runs them as separate stages)."""
+    data: dict
+    cache_key: str
+    cached: bool = False
+    ai_ok: bool = False
+
+    @property
+    def needs_mileage(self) -> bool:
+        data = self.data
+        if not (data.get("pickups") and data.get("deliveries")):
+            return False
+        return not data.get("total_miles") or str(data["total_miles"]) in ["", "N/A", "0"]
+
+
+async def analyze_text(text: str, on_progress=None) -> Extraction:
+    """
+    RC text -> load fields and stops (no mileage yet). `on_progress(partial)` is
+    called with the fields and stops extracted so far while DeepSeek is streaming.
+    """
     logger.info("Starting Multi-Stop Cumulative Extraction Pipeline... 💅")
-    
-    data = await deepseek_ai_extract(text)
+
+    # Same load re-sent (or only whitespace changed)? No LLM, no routing.
+    cache_key = result_cache.text_key(text)
+    cached = await result_cache.get(cache_key)
+    if cached is not None:
+        return Extraction(cached, cache_key, cached=True)
+
+    # Known broker layout? Milliseconds instead of an LLM round-trip.
+    data, confidence, parser_name = parse_known_broker(text)
+    parsed = bool(data)
+    if data:
+        logger.info(f"⚡ Parsed by {parser_name} layout (confidence {confidence:.2f}), skipping DeepSeek")
+    else:
+        if parser_name:
+            logger.info(f"🤔 {parser_name} layout matched but only {confidence:.2f} confident, asking DeepSeek")
+        data = await stream_extract(text, on_progress)
+    ai_ok = bool(data)
     
     if not data:
         data = {"broker": "N/A", "load_number": "", "rate": "", "total_miles": "N/A"}
@@ -213,31 +459,38 @@ async def smart_extract(text: str) -> dict:
         if not data.get("rate") or data["rate"] == "0.00":
             data["rate"] = rate_match.group(1)
 
-    # Cumulative Mileage Logic: PU1 -> DEL1 -> DEL2
-    if not data.get("total_miles") or str(data["total_miles"]) in ["", "N/A", "0"]:
-        if data.get("pickups") and data.get("deliveries"):
-            all_stops = data["pickups"] + data["deliveries"]
-            total_cumulative_miles = 0.0
-            valid_segments = 0
-            
-            logger.info(f"⚙️ Calculating cumulative mileage for {len(all_stops)} stops...")
-            
-            for i in range(len(all_stops) - 1):
-                seg_origin = all_stops[i]["address"]
-                seg_dest = all_stops[i+1]["address"]
-                
-                logger.info(f"🛣️ Leg {i+1}: Calculating {seg_origin} TO {seg_dest}")
-                seg_miles = await get_miles_free(seg_origin, seg_dest)
-                
-                if seg_miles != "N/A":
-                    total_cumulative_miles += float(seg_miles)
-                    valid_segments += 1
-                    logger.info(f"✅ Leg {i+1} Distance: {seg_miles} mi")
-            
-            if valid_segments > 0:
-                data["total_miles"] = str(round(total_cumulative_miles, 1))
-                logger.info(f"🏁 Total Trip Miles: {data['total_miles']} mi")
-            else:
-                data["total_miles"] = "N/A"
-            
-    return data
\ No newline at end of file
+    # Still gaps after the regex patch? Ask again for just those fields, with just the relevant lines.
+    # (Not for parser hits: those exist to avoid LLM round-trips.)
+    if ai_ok and not parsed and (missing := missing_fields(data)):
+        logger.info(f"🎯 Missing after first pass: {', '.join(missing)}")
+        recovered = await refill_missing(text, data, missing)
+        if recovered:
+            logger.info(f"🎯 Recovered by follow-up: {', '.join(recovered)}")
+
+    return Extraction(data, cache_key, ai_ok=ai_ok)
+
+
+async def finish_extraction(extraction: Extraction, on_estimate=None) -> dict:
+    """
+    Mileage for the stops, then the result cache. Returns the final load data.
+    `on_estimate(miles)` gets the instant offline estimate while routing runs.
+    """
+    data = extraction.data
+    if extraction.cached:
+        return data
+
+    # Cumulative Mileage Logic: PU1 -> DEL1 -> DEL2 (one routing request for the whole trip)
+    if extraction.needs_mileage:
+        all_stops = data["pickups"] + data["deliveries"]
+        logger.info(f"⚙️ Calculating cumulative mileage for {len(all_stops)} stops...")
+
+        addresses = [s.get("address", "") for s in all_stops]
+        data["total_miles"], data["miles_estimated"] = await get_mileage(addresses, on_estimate)
+        if data["total_miles"] != "N/A":
+            logger.info(f"🏁 Total Trip Miles: {data['total_miles']} mi")
+
+    # Only cache complete answers: an AI or routing outage should be retried next time
+    if extraction.ai_ok and data.get("total_miles") != "N/A" and not data.get("miles_estimated"):
+        await result_cache.put(extraction.cache_key, data)
+
+    return data
@@ -0,0 +1,212 @@
+import os
+import re
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import select, delete
+from sqlalchemy.exc import IntegrityError
+
+from database.connection import AsyncSessionLocal
+from database.models import GeocodeCache
+from services.http_client import get_client
+from utils.rate_limit import TokenBucket
+
+load_dotenv()
+
+logger = logging.getLogger("Geocoder")
+
+Coords = Tuple[float, float]
+
+# Shippers and receivers repeat all week: resolved facilities are kept for months,
+# unresolvable addresses for a day (the OSM data or our cleanup might improve).
+GEOCODE_TTL_DAYS = float(os.getenv("GEOCODE_TTL_DAYS", "90"))
+GEOCODE_NEGATIVE_TTL_HOURS = float(os.getenv("GEOCODE_NEGATIVE_TTL_HOURS", "24"))
+GEOCODE_LRU_SIZE = int(os.getenv("GEOCODE_LRU_SIZE", "4096"))
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+# Public Nominatim allows 1 request/second; shared by every user and stop
+NOMINATIM_RPS = float(os.getenv("NOMINATIM_RPS", "1"))
+# Max wait for one stop (queueing behind the rate limit included)
+GEOCODE_DEADLINE_SECONDS = float(os.getenv("GEOCODE_DEADLINE_SECONDS", "20"))
+
+# Shared queue: every worker.py geocodes with its own bucket, so each gets
+# an equal share of the policy (JOB_WORKERS = how many of them run)
+if os.getenv("JOB_QUEUE_MODE", "local").lower() == "shared":
+    NOMINATIM_RPS /= max(1, int(os.getenv("JOB_WORKERS", "1")))
+
+_nominatim_bucket = TokenBucket(rate=NOMINATIM_RPS, capacity=1)
+_inflight: Dict[str, "asyncio.Task"] = {}
+# Callers still awaiting each in-flight lookup, and the lookups still queued for a Nominatim slot
+_waiters: Dict[str, int] = {}
+_queued: set = set()
+
+# In-process LRU in front of the table: key -> (coords or None, expires_at)
+_lru: "OrderedDict[str, Tuple[Optional[Coords], float]]" = OrderedDict()
+
+stats = {"hits": 0, "misses": 0}
+
+_PUNCT_RE = re.compile(r"[^\w\s,#-]")
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_address(addr: str) -> str:
+    """'100 Main St., Dallas,  TX 75201' -> '100 MAIN ST, DALLAS, TX 75201'"""
+    addr = _PUNCT_RE.sub(" ", addr.upper())
+    parts = [_WS_RE.sub(" ", p).strip() for p in addr.split(",")]
+    return ", ".join(p for p in parts if p)
+
+
+def _lru_get(key: str):
+    item = _lru.get(key)
+    if item is None:
+        return False, None
+    coords, expires_at = item
+    if expires_at < time.time():
+        _lru.pop(key, None)
+        return False, None
+    _lru.move_to_end(key)
+    return True, coords
+
+
+def _lru_put(key: str, coords: Optional[Coords], ttl_seconds: float):
+    _lru[key] = (coords, time.time() + ttl_seconds)
+    _lru.move_to_end(key)
+    while len(_lru) > GEOCODE_LRU_SIZE:
+        _lru.popitem(last=False)
+
+
+def _ttl_seconds(coords: Optional[Coords]) -> float:
+    if coords is None:
+        return GEOCODE_NEGATIVE_TTL_HOURS * 3600
+    return GEOCODE_TTL_DAYS * 86400
+
+
+async def _db_get(key: str):
+    async with AsyncSessionLocal() as session:
+        res = await session.execute(select(GeocodeCache).where(GeocodeCache.address_key == key))
+        row = res.scalar_one_or_none()
+    if row is None:
+        return False, None, 0.0
+
+    coords = (row.lat, row.lon) if row.lat is not None and row.lon is not None else None
+    age = (datetime.utcnow() - row.updated_at).total_seconds()
+    left = _ttl_seconds(coords) - age
+    if left <= 0:
+        return False, None, 0.0
+    return True, coords, left
+
+
+async def _db_put(key: str, coords: Optional[Coords]):
+    lat, lon = coords if coords else (None, None)
+    async with AsyncSessionLocal() as session:
+        await session.execute(delete(GeocodeCache).where(GeocodeCache.address_key == key))
+        session.add(GeocodeCache(address_key=key, lat=lat, lon=lon, updated_at=datetime.utcnow()))
+        try:
+            await session.commit()
+        except IntegrityError:
+            await session.rollback()
+
+
+async def fetch_coords(addr: str):
+    """
+    Raw Nominatim lookup.
+    Returns (found, coords): found=False means a network/HTTP error (don't cache),
+    found=True with coords=None means Nominatim has no match (negative cache).
+    """
+    try:
+        r = await get_client("nominatim").get(
+            NOMINATIM_URL,
+            params={"q": addr, "format": "json", "limit": 1},
+            timeout=15
+        )
+        if r.status_code != 200:
+            logger.error(f"❌ Geocoding HTTP {r.status_code} for {addr}")
+            return False, None
+        results = r.json()
+        if not results:
+            return True, None
+        return True, (float(results[0]["lat"]), float(results[0]["lon"]))
+    except Exception as e:
+        logger.error(f"❌ Geocoding Failed for {addr}: {e}")
+        return False, None
+
+
+async def _resolve(key: str, addr: str) -> Optional[Coords]:
+    """Database, then a rate-limited Nominatim call. Runs once per key even if many stops ask."""
+    try:
+        found, coords, left = await _db_get(key)
+    except Exception as e:
+        logger.warning("Geocode cache read failed: %s", e)
+        found = False
+    if found:
+        stats["hits"] += 1
+        _lru_put(key, coords, left)
+        return coords
+
+    stats["misses"] += 1
+    # Nominatim usage policy: max 1 request/second for the whole bot
+    _queued.add(key)
+    try:
+        await _nominatim_bucket.acquire()
+    finally:
+        _queued.discard(key)
+    definitive, coords = await fetch_coords(addr)
+    if not definitive:
+        return None
+
+    _lru_put(key, coords, _ttl_seconds(coords))
+    try:
+        await _db_put(key, coords)
+    except Exception as e:
+        logger.warning("Geocode cache write failed: %s", e)
+    return coords
+
+
+async def geocode(addr: str, timeout: float = GEOCODE_DEADLINE_SECONDS) -> Optional[Coords]:
+    """
+    Address -> (lat, lon) through LRU -> database -> Nominatim. 🗺️
+    Concurrent lookups of the same address share one in-flight request.
+    Gives up after `timeout` seconds. A lookup that already has its Nominatim
+    slot keeps running and still lands in the cache for the next load; one
+    still queued for a slot is dropped once nobody waits for it, so abandoned
+    work can't pile up in front of live stops.
+    """
+    if not addr:
+        return None
+    key = normalize_address(addr)
+    if not key:
+        return None
+
+    found, coords = _lru_get(key)
+    if found:
+        stats["hits"] += 1
+        return coords
+
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_resolve(key, addr))
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _inflight.pop(key) if _inflight.get(key) is t else None)
+
+    _waiters[key] = _waiters.get(key, 0) + 1
+    try:
+        # shield: one caller's deadline must not cancel the lookup for the others
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"⏱️ Geocoding deadline ({timeout:.0f}s) hit for {addr}")
+    except Exception as e:
+        logger.error(f"❌ Geocoding Failed for {addr}: {e}")
+    finally:
+        _waiters[key] -= 1
+        if not _waiters[key]:
+            del _waiters[key]
+            if key in _queued and not task.done():
+                # Nobody waits for it any more: don't spend a Nominatim slot on it
+                _inflight.pop(key, None)
+                task.cancel()
+    return None
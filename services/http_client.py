@@ -0,0 +1,65 @@
+import os
+import logging
+import importlib.util
+from typing import Dict
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger("HTTPClients")
+
+# One pooled client per upstream, so each host gets its own connection limits
+# and keep-alive pool instead of a fresh TLS handshake per PDF/chat message.
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "1") == "1"
+
+_UPSTREAMS = {
+    # name: (max_connections, max_keepalive_connections, default headers)
+    "deepseek": (int(os.getenv("DEEPSEEK_MAX_CONNECTIONS", "20")), 10, {}),
+    "nominatim": (4, 2, {"User-Agent": "LazyBot_Logistics/2.0"}),
+    "osrm": (8, 4, {}),
+}
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _http2_available() -> bool:
+    return HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+
+
+def _create(name: str) -> httpx.AsyncClient:
+    max_conn, keepalive, headers = _UPSTREAMS.get(name, (10, 5, {}))
+    return httpx.AsyncClient(
+        http2=_http2_available(),
+        headers=headers,
+        limits=httpx.Limits(
+            max_connections=max_conn,
+            max_keepalive_connections=keepalive,
+            keepalive_expiry=60,
+        ),
+        timeout=httpx.Timeout(30.0, connect=10.0),
+    )
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    """Returns the shared client for an upstream (created lazily outside the bot, e.g. scripts)."""
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        client = _clients[name] = _create(name)
+    return client
+
+
+async def init_http_clients():
+    for name in _UPSTREAMS:
+        get_client(name)
+    logger.info("HTTP clients ready: %s (HTTP/2: %s)", ", ".join(_clients), _http2_available())
+
+
+async def close_http_clients():
+    for name, client in list(_clients.items()):
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.warning("Closing HTTP client %s failed: %s", name, e)
+    _clients.clear()
@@ -0,0 +1,305 @@
+import os
+import logging
+from datetime import datetime, timedelta
+from typing import Collection, Dict, List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import select, update, delete, func, case, and_, or_, false
+
+from database.connection import AsyncSessionLocal, engine
+from database.models import PdfJob
+
+load_dotenv()
+
+logger = logging.getLogger("JobStore")
+
+# A failed PDF is retried after 30s, 60s, ... (capped), then dead-lettered
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "30"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "600"))
+# Jobs older than this are not resumed after a restart (their PDFs are deleted after 24h)
+JOB_MAX_AGE_HOURS = float(os.getenv("JOB_MAX_AGE_HOURS", "24"))
+# Finished and dead jobs are kept this long for the admin stats / debugging
+JOB_RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", "7"))
+
+# Shared queue (worker.py): a claimed job whose worker stopped reporting
+# stages for this long is taken over by another worker
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "600"))
+
+# Shared mode: a reply that keeps failing to send is given up after this many tries
+JOB_MAX_DELIVERY_ATTEMPTS = int(os.getenv("JOB_MAX_DELIVERY_ATTEMPTS", "5"))
+
+ACTIVE_STATES = ("queued", "running", "retry")
+FINAL_STATES = ("done", "dead", "undeliverable")
+
+
+def retry_delay(attempts: int) -> Optional[float]:
+    """Backoff before the next attempt, or None when the job should be dead-lettered."""
+    if attempts >= JOB_MAX_ATTEMPTS:
+        return None
+    return min(JOB_RETRY_MAX_SECONDS, JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+
+async def create(**fields) -> Optional[int]:
+    """Persists a new queued job. Returns its id, or None if the database is unavailable."""
+    try:
+        async with AsyncSessionLocal() as session:
+            job = PdfJob(state="queued", **fields)
+            session.add(job)
+            await session.commit()
+            return job.id
+    except Exception as e:
+        logger.warning("Job create failed (continuing in memory): %s", e)
+        return None
+
+
+async def _update(job_id: Optional[int], **values):
+    if job_id is None:
+        return
+    values["updated_at"] = datetime.utcnow()
+    try:
+        async with AsyncSessionLocal() as session:
+            await session.execute(update(PdfJob).where(PdfJob.id == job_id).values(**values))
+            await session.commit()
+    except Exception as e:
+        logger.warning("Job %s update failed: %s", job_id, e)
+
+
+async def mark_stage(job_id: Optional[int], stage: str):
+    values = {"state": "running", "stage": stage}
+    if stage == "download":
+        values["started_at"] = datetime.utcnow()
+    await _update(job_id, **values)
+
+
+async def mark_done(job_id: Optional[int], result_ref: Optional[str]):
+    now = datetime.utcnow()
+    await _update(job_id, state="done", result_ref=result_ref, finished_at=now, delivered_at=now, last_error=None)
+
+
+async def mark_ready(job_id: Optional[int], text: str, result_ref: Optional[str]):
+    """Shared mode: the worker is finished, the polling process still has to send `text`."""
+    await _update(job_id, state="ready", result_text=text, result_ref=result_ref,
+                  finished_at=datetime.utcnow(), last_error=None)
+
+
+async def mark_delivered(job_id: Optional[int]):
+    # The rendered reply is only held until it is sent; metadata stays until prune()
+    await _update(job_id, delivered_at=datetime.utcnow(), result_text=None,
+                  state=case((PdfJob.state == "ready", "done"), else_=PdfJob.state))
+
+
+async def mark_delivery_failed(job_id: Optional[int], attempts: int, error: str, permanent: bool):
+    """
+    A reply couldn't be sent. Transient errors back off (10s, 20s, ...);
+    permanent ones (bot blocked, chat gone) or too many tries end it as undeliverable.
+    """
+    if permanent or attempts >= JOB_MAX_DELIVERY_ATTEMPTS:
+        await _update(job_id, state="undeliverable", delivery_attempts=attempts, result_text=None,
+                      last_error=f"Delivery: {error}"[:2000])
+    else:
+        delay = min(JOB_RETRY_MAX_SECONDS, 10 * 2 ** (attempts - 1))
+        await _update(job_id, delivery_attempts=attempts,
+                      next_attempt_at=datetime.utcnow() + timedelta(seconds=delay))
+
+
+async def mark_failed(job_id: Optional[int], attempts: int, error: str) -> Optional[float]:
+    """Records a failed attempt. Returns the retry delay, or None if the job is now dead."""
+    delay = retry_delay(attempts)
+    if delay is None:
+        await _update(job_id, state="dead", attempts=attempts, last_error=error[:2000],
+                      result_text=None, finished_at=datetime.utcnow())
+    else:
+        await _update(job_id, state="retry", attempts=attempts, last_error=error[:2000],
+                      next_attempt_at=datetime.utcnow() + timedelta(seconds=delay))
+    return delay
+
+
+def _claimable(now: datetime):
+    return or_(
+        and_(
+            PdfJob.state.in_(("queued", "retry")),
+            or_(PdfJob.next_attempt_at.is_(None), PdfJob.next_attempt_at <= now),
+        ),
+        # Worker died mid-job: its lease ran out
+        and_(PdfJob.state == "running", PdfJob.updated_at < now - timedelta(seconds=JOB_LEASE_SECONDS)),
+    )
+
+
+async def claim(limit: int, worker: str, per_user_cap: int) -> List[PdfJob]:
+    """
+    Takes up to `limit` due jobs for this worker, oldest first, at most
+    `per_user_cap` running per user across all workers.
+
+    Postgres: candidate rows are FOR UPDATE SKIP LOCKED, so concurrent workers
+    never wait on (or double-claim) each other's rows, and a user is only
+    counted and claimed for under a transaction-scoped advisory lock on their
+    id (another worker busy claiming for them -> skip the user this round).
+    SQLite: no row locks, so the claim takes the database write lock before
+    counting; rows are still claimed with a compare-and-set update.
+    """
+    if limit <= 0:
+        return []
+    now = datetime.utcnow()
+    lease_cutoff = now - timedelta(seconds=JOB_LEASE_SECONDS)
+    query = select(PdfJob).where(_claimable(now)).order_by(PdfJob.id).limit(limit * 4)
+    sqlite = engine.dialect.name == "sqlite"
+    if not sqlite:
+        query = query.with_for_update(skip_locked=True)
+
+    claimed = []
+    try:
+        async with AsyncSessionLocal() as session:
+            if sqlite:
+                # A write statement (even one touching no rows) takes SQLite's write lock;
+                # other workers' claims wait here until we commit
+                await session.execute(
+                    update(PdfJob).where(false()).values(worker=PdfJob.worker)
+                    .execution_options(synchronize_session=False)
+                )
+
+            per_user: Dict[int, int] = {}
+            for job in (await session.execute(query)).scalars().all():
+                if len(claimed) >= limit:
+                    break
+                if job.tg_id not in per_user:
+                    per_user[job.tg_id] = await _running_for_user(session, job.tg_id, lease_cutoff, sqlite, per_user_cap)
+                if per_user[job.tg_id] >= per_user_cap:
+                    continue
+
+                values = {"state": "running", "stage": "claimed", "worker": worker, "updated_at": now}
+                if job.state == "running":
+                    values["attempts"] = (job.attempts or 0) + 1
+                    values["last_error"] = f"Worker {job.worker} stopped during {job.stage or 'queue'}"
+                    if values["attempts"] >= JOB_MAX_ATTEMPTS:
+                        values.update(state="dead", finished_at=now)
+
+                if sqlite:
+                    res = await session.execute(
+                        update(PdfJob)
+                        .where(PdfJob.id == job.id, PdfJob.state == job.state, PdfJob.updated_at == job.updated_at)
+                        .values(**values)
+                        .execution_options(synchronize_session=False)
+                    )
+                    if res.rowcount != 1:
+                        continue  # another worker got there first
+                for key, value in values.items():
+                    setattr(job, key, value)
+
+                if job.state == "running":
+                    per_user[job.tg_id] += 1
+                    claimed.append(job)
+            await session.commit()
+    except Exception as e:
+        logger.warning("Job claim failed: %s", e)
+        return []
+    return claimed
+
+
+async def _running_for_user(session, tg_id: int, lease_cutoff: datetime, sqlite: bool, per_user_cap: int) -> int:
+    """Live running jobs of one user; `per_user_cap` (= skip) if another worker holds their lock."""
+    if not sqlite:
+        # Released at commit; pdf_jobs is the only user of advisory locks, so the bare user id is the key
+        locked = await session.execute(select(func.pg_try_advisory_xact_lock(tg_id)))
+        if not locked.scalar():
+            return per_user_cap
+    res = await session.execute(
+        select(func.count(PdfJob.id))
+        .where(PdfJob.tg_id == tg_id, PdfJob.state == "running", PdfJob.updated_at >= lease_cutoff)
+    )
+    return res.scalar() or 0
+
+
+async def pending_results(limit: int = 50, exclude: Collection[int] = ()) -> List[PdfJob]:
+    """Shared mode: finished (or dead-lettered) jobs whose reply hasn't been sent yet, minus `exclude` (in flight)."""
+    now = datetime.utcnow()
+    cutoff = now - timedelta(hours=JOB_MAX_AGE_HOURS)
+    query = (
+        select(PdfJob)
+        .where(PdfJob.state.in_(("ready", "dead")), PdfJob.delivered_at.is_(None),
+               PdfJob.created_at >= cutoff,
+               or_(PdfJob.next_attempt_at.is_(None), PdfJob.next_attempt_at <= now))
+        .order_by(PdfJob.id)
+        .limit(limit)
+    )
+    if exclude:
+        query = query.where(PdfJob.id.notin_(list(exclude)))
+    try:
+        async with AsyncSessionLocal() as session:
+            res = await session.execute(query)
+            return list(res.scalars())
+    except Exception as e:
+        logger.warning("Pending results lookup failed: %s", e)
+        return []
+
+
+async def waiting_count() -> int:
+    try:
+        async with AsyncSessionLocal() as session:
+            res = await session.execute(select(func.count(PdfJob.id)).where(PdfJob.state.in_(("queued", "retry"))))
+            return res.scalar() or 0
+    except Exception:
+        return 0
+
+
+async def load_unfinished() -> List[PdfJob]:
+    """
+    Jobs a previous process left queued, running or waiting to retry.
+    An interrupted run counts as an attempt (the job may be what crashed us);
+    jobs that are too old or out of attempts are dead-lettered instead.
+    """
+    now = datetime.utcnow()
+    cutoff = now - timedelta(hours=JOB_MAX_AGE_HOURS)
+    resumable = []
+    try:
+        async with AsyncSessionLocal() as session:
+            res = await session.execute(
+                select(PdfJob).where(PdfJob.state.in_(ACTIVE_STATES)).order_by(PdfJob.id)
+            )
+            for job in res.scalars():
+                if job.state == "running":
+                    job.attempts = (job.attempts or 0) + 1
+                    job.last_error = f"Interrupted by a restart during {job.stage or 'queue'}"
+                if job.created_at < cutoff or (job.attempts or 0) >= JOB_MAX_ATTEMPTS:
+                    job.state = "dead"
+                    job.finished_at = now
+                else:
+                    if job.state == "running":
+                        job.state = "queued"
+                    resumable.append(job)
+                job.updated_at = now
+            await session.commit()
+    except Exception as e:
+        logger.error("Could not load unfinished jobs: %s", e)
+        return []
+    return resumable
+
+
+async def counts() -> Dict[str, int]:
+    try:
+        async with AsyncSessionLocal() as session:
+            res = await session.execute(select(PdfJob.state, func.count(PdfJob.id)).group_by(PdfJob.state))
+            return dict(res.all())
+    except Exception as e:
+        logger.warning("Job stats failed: %s", e)
+        return {}
+
+
+async def prune():
+    now = datetime.utcnow()
+    cutoff = now - timedelta(days=JOB_RETENTION_DAYS)
+    try:
+        async with AsyncSessionLocal() as session:
+            # Results nobody could send within JOB_MAX_AGE_HOURS (pending_results stops offering them)
+            await session.execute(
+                update(PdfJob)
+                .where(PdfJob.state == "ready", PdfJob.created_at < now - timedelta(hours=JOB_MAX_AGE_HOURS))
+                .values(state="undeliverable", result_text=None, updated_at=now,
+                        last_error="Delivery: not sent in time")
+            )
+            await session.execute(
+                delete(PdfJob).where(PdfJob.state.in_(FINAL_STATES), PdfJob.updated_at < cutoff)
+            )
+            await session.commit()
+    except Exception as e:
+        logger.warning("Job prune failed: %s", e)
@@ -0,0 +1,52 @@
+import re
+import logging
+
+logger = logging.getLogger("PageFilter")
+
+# Pages are joined with a form feed by services/pdf_engine.py (same as pdftotext)
+PAGE_BREAK = "\f"
+
+# Load data words: a page full of these is worth OCR and LLM tokens 🧠
+LOAD_KEYWORDS_RE = re.compile(
+    r"\b(?:pick\s*-?\s*up|pu\s*#|shipper|deliver(?:y|ies)|consignee|receiver|stop\s*\d|"
+    r"rate|linehaul|line\s*haul|fuel|total|load\s*(?:#|number|no)|pro\s*#|order\s*#|"
+    r"bol|po\s*#|ref(?:erence)?\s*#|weight|lbs|commodity|pallets?|appointment|appt|"
+    r"equipment|reefer|dry\s*van|flatbed|temp(?:erature)?|miles)\b",
+    re.I,
+)
+
+# Carrier agreement fingerprints: typical T&C pages hit several of these
+BOILERPLATE_RE = re.compile(
+    r"terms\s+and\s+conditions|indemnif|hold\s+harmless|governing\s+law|arbitration|"
+    r"force\s+majeure|limitation\s+of\s+liability|cargo\s+claims?|double[\s-]+brokering|"
+    r"hereby\s+agrees?|pursuant\s+to|in\s+witness\s+whereof|notwithstanding|"
+    r"shall\s+not\s+be\s+liable|independent\s+contractor|carmack|49\s+u\.?s\.?c|"
+    r"back[\s-]+solicit|re-?broker|entire\s+agreement|severab",
+    re.I,
+)
+
+WORD_RE = re.compile(r"\w+")
+
+# A page is treated as boilerplate only if it clearly looks like one:
+# at least this many legal fingerprints and few load keywords per 100 words.
+MIN_BOILERPLATE_HITS = 3
+MAX_BOILERPLATE_KEYWORD_DENSITY = 2.0
+
+
+def _density(hits: int, text: str) -> float:
+    words = len(WORD_RE.findall(text))
+    return 100.0 * hits / words if words else 0.0
+
+
+def score_page(text: str) -> float:
+    """Load-keyword density per 100 words, penalized by legal fingerprints."""
+    keywords = len(LOAD_KEYWORDS_RE.findall(text))
+    boilerplate = len(BOILERPLATE_RE.findall(text))
+    return _density(keywords, text) - _density(boilerplate, text) * 2
+
+
+def is_boilerplate(text: str) -> bool:
+    """True for carrier terms / legal pages that carry no load data."""
+    if len(BOILERPLATE_RE.findall(text)) < MIN_BOILERPLATE_HITS:
+        return False
+    return _density(len(LOAD_KEYWORDS_RE.findall(text)), text) <= MAX_BOILERPLATE_KEYWORD_DENSITY
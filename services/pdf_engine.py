@@ -1,62 +1,487 @@
+import os
+import io
 import asyncio
-from functools import partial
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 import pdfplumber
 import pytesseract
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
+from PIL import Image
 import logging
+from dotenv import load_dotenv
+
+from services import text_cache
+from services.page_filter import PAGE_BREAK, is_boilerplate
+
+load_dotenv()
 
 # Loglarni sozlash
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("PDFEngine")
 
+# Sahifa "buzuq" deb hisoblanadigan minimal matn uzunligi
+MIN_PAGE_CHARS = 25
+
+# Adaptiv OCR: avval past DPI, Tesseract ishonchi (o'rtacha so'z conf)
+# chegaradan past bo'lgan sahifalargina keyingi DPI-da qayta render qilinadi.
+OCR_DPI_LADDER = [int(d) for d in os.getenv("OCR_DPI_LADDER", "150,300").split(",") if d.strip()] or [300]
+OCR_MIN_CONFIDENCE = float(os.getenv("OCR_MIN_CONFIDENCE", "75"))
+
+# OCR backend: auto (tesserocr bo'lsa o'sha) | tesserocr | pytesseract
+OCR_BACKEND = os.getenv("OCR_BACKEND", "auto")
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+
+# OCR process pool sozlamalari
+# Har bir worker N ta ishdan keyin qayta yaratiladi (xotira "oqishi"ga qarshi)
+OCR_WORKER_MAX_TASKS = int(os.getenv("OCR_WORKER_MAX_TASKS", "50"))
+# Har bir worker uchun xotira chegarasi (MB), 0 = cheklovsiz
+OCR_WORKER_MEMORY_MB = int(os.getenv("OCR_WORKER_MEMORY_MB", "1536"))
+# Butun OCR pool uchun xotira byudjeti (MB): konteyner limitidan kelib chiqib qo'yiladi
+OCR_MEMORY_BUDGET_MB = int(os.getenv("OCR_MEMORY_BUDGET_MB", "3072"))
+
+
+def _default_ocr_workers() -> int:
+    """
+    os.cpu_count() konteynerning CPU kvotasini emas, host yadrolarini beradi:
+    ko'p yadroli hostda o'nlab worker (har biri OCR_WORKER_MEMORY_MB gacha) OOM-ga olib keladi.
+    Shuning uchun: xotira byudjeti / worker limiti, bizga ajratilgan yadrolar bilan cheklangan.
+    """
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    by_memory = OCR_MEMORY_BUDGET_MB // OCR_WORKER_MEMORY_MB if OCR_WORKER_MEMORY_MB > 0 else 2
+    return max(1, min(by_memory, cores))
+
+
+# OCR_WORKERS=0 -> _default_ocr_workers()
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "0")) or _default_ocr_workers()
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+# PDF manbasi: diskdagi fayl yo'li yoki xotiradagi baytlar (Telegram-dan to'g'ridan-to'g'ri)
+PdfSource = Union[str, bytes]
+
 
+def _digest(source: PdfSource) -> str:
+    if isinstance(source, bytes):
+        return text_cache.sha256_bytes(source)
+    return text_cache.sha256_file(source)
 
-def extract_text_sync(pdf_path: str) -> str:
+
+def _spool(source: PdfSource) -> str:
     """
-    PDF-dan matn ajratish. 
-    (cid:X) xatoligi yoki bo'sh matn bo'lsa OCR ishlatadi.
+    Poppler (pdftoppm/pdfinfo) faqat fayl o'qiydi: pdf2image-ning *_from_bytes
+    funksiyalari har chaqiruvda PDF-ni mkstemp faylga yozadi. Shuning uchun
+    baytlar hujjat uchun bir marta ./temp-ga yoziladi va barcha sahifalar
+    (va pool worker-lari) shu yo'lni oladi.
     """
-    text = ""
-    
-    # 1. Raqamli matnni ajratishga urinish
+    if isinstance(source, str):
+        return source
+    os.makedirs("temp", exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=".pdf", dir="temp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(source)
+    return path
+
+
+def _unspool(source: PdfSource, path: str):
+    if path is not source:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+@contextmanager
+def _as_path(source: PdfSource) -> Iterator[str]:
+    path = _spool(source)
     try:
-        with pdfplumber.open(pdf_path) as pdf:
+        yield path
+    finally:
+        _unspool(source, path)
+
+
+def _render_page(path: str, page_no: int, dpi: int) -> List[Image.Image]:
+    # Poppler o'rnatilgan va PATH-da bo'lishi shart!
+    return convert_from_path(path, dpi=dpi, first_page=page_no, last_page=page_no)
+
+
+def _page_is_broken(page_text: str) -> bool:
+    """
+    Bitta sahifa uchun tekshiruv: (cid:X) yoki deyarli bo'sh matn.
+    Logo yoki skaner qilingan sahifalar shu yerda ushlanadi.
+    """
+    if "(cid:" in page_text:
+        return True
+    return len(page_text.strip()) < MIN_PAGE_CHARS
+
+
+def _digital_pass(source: PdfSource) -> List[str]:
+    """
+    Har bir sahifa uchun pdfplumber matni (layout=True).
+    pdfplumber faylni ocha olmasa, har bir sahifa bo'sh qaytadi
+    (ya'ni hammasi OCR-ga tushadi).
+    """
+    try:
+        pages = []
+        with pdfplumber.open(io.BytesIO(source) if isinstance(source, bytes) else source) as pdf:
             for page in pdf.pages:
                 # Layout=True jadval ko'rinishidagi matnlarni tartibli saqlaydi
-                page_text = page.extract_text(layout=True)
-                if page_text:
-                    text += page_text + "\n"
+                pages.append(page.extract_text(layout=True) or "")
+        return pages
     except Exception as e:
         logger.error(f"pdfplumber error: {e}")
 
-    # 2. Xatolikni tekshirish (cid muammosi yoki juda qisqa matn)
-    # Solvera kabi PDF-larda (cid:2) chiqsa, bu extraction muvaffaqiyatsizligini bildiradi
-    is_broken = "(cid:" in text
-    is_too_short = len(text.strip()) < 50
+    try:
+        with _as_path(source) as path:
+            info = pdfinfo_from_path(path)
+        return [""] * int(info["Pages"])
+    except Exception as e:
+        logger.error(f"pdfinfo error: {e}")
+        return []
+
 
-    if is_broken or is_too_short:
-        logger.info(f"Digital extraction failed (Broken: {is_broken}, Short: {is_too_short}). Starting OCR...")
+def _rss_mb() -> float:
+    """
+    Process-ning hozirgi RSS-i, MB (/proc/self/statm). ru_maxrss bu yerda yaramaydi:
+    qayta ishlatiladigan pool worker-ida u shu worker ko'rgan eng og'ir hujjatni ko'rsatadi.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return 0.0
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def _iter_page_images(path: str, page_numbers: Iterable[int], dpi: int) -> Iterator[Tuple[int, Optional[Image.Image]]]:
+    """
+    Sahifalarni bittadan rasmga aylantiradi (page_no 1 dan boshlanadi).
+    Xotirada bir vaqtda faqat bitta sahifa rasmi turadi: keyingisi
+    render qilinishidan oldin oldingisi yopiladi. Render xatosi bo'lsa
+    (page_no, None) qaytadi.
+    """
+    for page_no in page_numbers:
         try:
-            # PDF-ni rasmlarga aylantirish
-            # Poppler o'rnatilgan va PATH-da bo'lishi shart!
-            images = convert_from_path(pdf_path, dpi=300)
-            ocr_text = ""
+            images = _render_page(path, page_no, dpi)
+        except Exception as e:
+            logger.error(f"Rasterization error on page {page_no}: {e}")
+            yield page_no, None
+            continue
+
+        try:
+            yield page_no, images[0] if images else None
+        finally:
             for img in images:
-                # Tesseract orqali rasmdan matnni o'qish
-                ocr_text += pytesseract.image_to_string(img) + "\n"
-            text = ocr_text
-            logger.info("OCR successfully extracted text.")
+                img.close()
+            del images
+
+
+# ================= OCR BACKENDS =================
+class PytesseractBackend:
+    """
+    Har bir sahifa uchun alohida `tesseract` process (pytesseract).
+    Sekinroq, lekin faqat tesseract binary kerak — zaxira variant.
+    """
+    name = "pytesseract"
+
+    def ocr(self, img: Image.Image) -> Tuple[str, float]:
+        """
+        Bitta Tesseract chaqiruvi bilan matn va o'rtacha so'z ishonchini oladi.
+        Matn image_to_data qatorlaridan (block/par/line) qayta yig'iladi.
+        """
+        data = pytesseract.image_to_data(img, lang=OCR_LANG, output_type=pytesseract.Output.DICT)
+
+        lines: Dict[Tuple[int, int, int], List[str]] = {}
+        confs: List[float] = []
+        for i, word in enumerate(data["text"]):
+            word = (word or "").strip()
+            if not word:
+                continue
+            key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            lines.setdefault(key, []).append(word)
+            conf = float(data["conf"][i])
+            if conf >= 0:
+                confs.append(conf)
+
+        out: List[str] = []
+        prev_block = None
+        for (block, _, _), words in lines.items():
+            if prev_block is not None and block != prev_block:
+                out.append("")
+            out.append(" ".join(words))
+            prev_block = block
+
+        return "\n".join(out), (sum(confs) / len(confs) if confs else 0.0)
+
+
+class TesserocrBackend:
+    """
+    Tesseract process ichida (tesserocr, C API). `eng` traineddata har bir
+    worker-da bir marta yuklanadi va keyingi sahifalar uchun qayta ishlatiladi —
+    process spawn va vaqtinchalik rasm fayli yo'q.
+    """
+    name = "tesserocr"
+
+    def __init__(self):
+        import tesserocr
+
+        kwargs = {"lang": OCR_LANG}
+        if os.getenv("TESSDATA_PREFIX"):
+            kwargs["path"] = os.getenv("TESSDATA_PREFIX")
+        self._api = tesserocr.PyTessBaseAPI(**kwargs)
+        # Bitta API obyekti bir vaqtda faqat bitta rasmni qayta ishlay oladi
+        self._lock = threading.Lock()
+
+    def ocr(self, img: Image.Image) -> Tuple[str, float]:
+        with self._lock:
+            self._api.SetImage(img)
+            text = self._api.GetUTF8Text()
+            confs = [c for c in self._api.AllWordConfidences() if c >= 0]
+            self._api.Clear()
+        return text.strip(), (sum(confs) / len(confs) if confs else 0.0)
+
+
+_BACKENDS = {
+    "tesserocr": TesserocrBackend,
+    "pytesseract": PytesseractBackend,
+}
+
+_backend = None
+
+
+def get_ocr_backend(name: Optional[str] = None):
+    """
+    OCR_BACKEND: auto | tesserocr | pytesseract. Har bir process-da bitta
+    backend yaratiladi. tesserocr o'rnatilmagan yoki yuklanmasa
+    pytesseract-ga qaytamiz. Hech biri yuklanmasa RuntimeError.
+    """
+    global _backend
+    if name is None and _backend is not None:
+        return _backend
+
+    wanted = (name or OCR_BACKEND).lower()
+    order = ["tesserocr", "pytesseract"] if wanted == "auto" else list(dict.fromkeys([wanted, "pytesseract"]))
+
+    backend = None
+    failures = []
+    for candidate in order:
+        try:
+            backend = _BACKENDS[candidate]()
+            break
         except Exception as e:
-            logger.error(f"OCR fatal error: {e}")
-            # Agar OCR ham ishlamasa, hech bo'lmasa mavjud buzuq matnni qaytaramiz
-            pass
+            logger.warning(f"OCR backend '{candidate}' unavailable: {e}")
+            failures.append(f"{candidate}: {e!r}")
+
+    if backend is None:
+        # Hech biri ishlamadi: OCR qila olmaymiz, sababini aniq aytamiz
+        raise RuntimeError("No OCR backend available (" + "; ".join(failures) + ")")
+
+    if name is None:
+        _backend = backend
+        logger.info(f"OCR backend: {backend.name}")
+    return backend
 
-    return text.strip()
 
-async def extract_text_async(pdf_path: str) -> str:
+def _ocr_image(img: Image.Image) -> Tuple[str, float]:
+    return get_ocr_backend().ocr(img)
+
+
+def _ocr_pages(path: str, page_numbers: List[int]) -> Tuple[Dict[int, Optional[str]], float]:
     """
-    Botning asosiy oqimi (loop) bloklanmasligi uchun
-    extraction jarayonini alohida thread-da bajaramiz.
+    Sahifalarni oqim tarzida OCR qiladi; muvaffaqiyatsiz sahifa None bo'ladi.
+    Har bir DPI bosqichida faqat ishonchi past sahifalar qayta render qilinadi,
+    eng yuqori ishonchli natija saqlanadi.
     """
+    best: Dict[int, Tuple[str, float, int]] = {}
+    pending = list(page_numbers)
+    # RSS o'sishi: har bir sahifa render/OCR qilingandan keyin o'lchanadi
+    base_rss = peak_rss = _rss_mb()
+
+    for dpi in OCR_DPI_LADDER:
+        if not pending:
+            break
+        retry = []
+        for page_no, img in _iter_page_images(path, pending, dpi):
+            if img is None:
+                continue
+            try:
+                text, conf = _ocr_image(img)
+            except Exception as e:
+                logger.error(f"OCR error on page {page_no} at {dpi} DPI: {e}")
+                continue
+            finally:
+                peak_rss = max(peak_rss, _rss_mb())
+
+            if page_no not in best or conf > best[page_no][1]:
+                best[page_no] = (text, conf, dpi)
+            # T&C sahifasini aniqroq o'qishning keragi yo'q
+            if conf < OCR_MIN_CONFIDENCE and not is_boilerplate(text):
+                retry.append(page_no)
+        pending = retry
+
+    results: Dict[int, Optional[str]] = {}
+    for page_no in page_numbers:
+        if page_no in best:
+            text, conf, dpi = best[page_no]
+            logger.info(f"OCR page {page_no}: {dpi} DPI, confidence {conf:.0f}")
+            results[page_no] = text
+        else:
+            results[page_no] = None
+
+    return results, peak_rss - base_rss
+
+
+def _ocr_page(path: str, page_no: int) -> Tuple[Optional[str], float]:
+    """
+    Faqat bitta sahifani OCR qiladi (process pool uchun: worker-ga PDF emas, yo'l yuboriladi).
+    Matn va shu sahifa uchun worker RSS o'sishini (MB) qaytaradi.
+    """
+    results, rss_delta = _ocr_pages(path, [page_no])
+    return results[page_no], rss_delta
+
+
+def _broken_pages(pages: List[str]) -> List[int]:
+    broken = [i for i, page_text in enumerate(pages) if _page_is_broken(page_text)]
+
+    # Shartnoma (T&C) sahifasi (cid:X) bilan buzilgan bo'lsa ham, undagi
+    # o'qiladigan so'zlar yetarli — bunday sahifani OCR qilmaymiz.
+    terms = [i for i in broken if is_boilerplate(pages[i])]
+    if terms:
+        logger.info(f"Skipping OCR for {len(terms)} terms-and-conditions page(s) {[i + 1 for i in terms]}.")
+        broken = [i for i in broken if i not in terms]
+
+    if broken:
+        logger.info(
+            f"Digital extraction failed on {len(broken)}/{len(pages)} page(s) "
+            f"{[i + 1 for i in broken]}. Starting per-page OCR..."
+        )
+    return broken
+
+
+def _merge_pages(pages: List[str], ocr_results: Dict[int, Optional[str]]) -> str:
+    """OCR natijalarini sahifa tartibida joyiga qo'yadi."""
+    for i, ocr_text in ocr_results.items():
+        # Agar OCR ishlamasa, hech bo'lmasa mavjud buzuq matnni qoldiramiz
+        if ocr_text and ocr_text.strip():
+            pages[i] = ocr_text
+    # Sahifalar \f bilan ajratiladi — keyin prompt uchun sahifama-sahifa tanlanadi
+    return PAGE_BREAK.join(p.strip("\n") for p in pages if p).strip()
+
+
+# ================= PROCESS POOL =================
+def _worker_init(memory_mb: int):
+    """Har bir OCR worker ishga tushganda xotira chegarasini o'rnatadi."""
+    if memory_mb <= 0:
+        return
+    try:
+        import resource
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError) as e:
+        logger.warning(f"Could not set OCR worker memory limit: {e}")
+
+
+def start_ocr_pool() -> ProcessPoolExecutor:
+    """
+    OCR/rasterization uchun alohida process pool.
+    'spawn' konteksti max_tasks_per_child (worker recycling) uchun shart.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=OCR_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_worker_init,
+            initargs=(OCR_WORKER_MEMORY_MB,),
+            max_tasks_per_child=OCR_WORKER_MAX_TASKS or None,
+        )
+        logger.info(
+            f"OCR pool started: {OCR_WORKERS} worker(s), "
+            f"recycle every {OCR_WORKER_MAX_TASKS} jobs, {OCR_WORKER_MEMORY_MB} MB ceiling"
+        )
+    return _pool
+
+
+def shutdown_ocr_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+        logger.info("OCR pool stopped.")
+
+
+def _reset_ocr_pool(broken_pool: ProcessPoolExecutor):
+    """Worker xotira chegarasidan oshib o'lsa, pool 'broken' bo'ladi — yangisini ochamiz."""
+    global _pool
+    # Bir nechta sahifa bir vaqtda yiqilsa, pool faqat bir marta almashtiriladi
+    if _pool is broken_pool:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+        start_ocr_pool()
+
+
+async def _run_in_pool(func, *args):
     loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, partial(extract_text_sync, pdf_path))
\ No newline at end of file
+    pool = start_ocr_pool()
+    try:
+        return await loop.run_in_executor(pool, func, *args)
+    except BrokenProcessPool:
+        logger.error("OCR worker crashed (memory ceiling?). Restarting pool.")
+        _reset_ocr_pool(pool)
+        raise
+
+
+async def _ocr_page_async(path: str, page_no: int) -> Tuple[Optional[str], float]:
+    try:
+        return await _run_in_pool(_ocr_page, path, page_no)
+    except Exception as e:
+        logger.error(f"OCR error on page {page_no}: {e}")
+        return None, 0.0
+
+
+async def extract_text_async(source: PdfSource, file_unique_id: Optional[str] = None) -> str:
+    """
+    Botning asosiy oqimi (loop) bloklanmasligi uchun extraction
+    alohida process pool-da bajariladi. Bitta hujjatning buzuq
+    sahifalari bir nechta worker-ga parallel taqsimlanadi.
+    Bir xil PDF (SHA-256) qayta kelsa, matn keshdan olinadi.
+    `source` — fayl yo'li yoki PDF baytlari. Raqamli matn baytlardan o'qiladi;
+    OCR kerak bo'lsagina baytlar bir marta vaqtinchalik faylga yoziladi.
+    """
+    digest = await asyncio.to_thread(_digest, source)
+    cached = await asyncio.to_thread(text_cache.get, digest)
+    if cached is not None:
+        logger.info(f"Text cache hit: {digest[:12]}")
+        return cached
+
+    pages = await _run_in_pool(_digital_pass, source)
+
+    broken = _broken_pages(pages)
+    results = []
+    if broken:
+        path = await asyncio.to_thread(_spool, source)
+        try:
+            ocr = await asyncio.gather(*(_ocr_page_async(path, i + 1) for i in broken))
+        finally:
+            await asyncio.to_thread(_unspool, source, path)
+        results = [page_text for page_text, _ in ocr]
+        # Sahifalar turli worker-larda parallel ishlaydi: hujjat uchun eng og'ir sahifa
+        logger.info(f"OCR'd {len(broken)} page(s), peak worker RSS +{max(d for _, d in ocr):.0f} MB")
+
+    text = _merge_pages(pages, dict(zip(broken, results)))
+    # A page whose OCR crashed may succeed next time — don't pin the partial text
+    if all(r is not None for r in results):
+        await asyncio.to_thread(text_cache.put, digest, text, file_unique_id)
+    return text
+
+
+async def cached_text_for_file(file_unique_id: Optional[str]) -> Optional[str]:
+    """Telegram file_unique_id bo'yicha kesh — yuklab olishning ham keragi yo'q."""
+    return await asyncio.to_thread(text_cache.get_by_file_id, file_unique_id)
@@ -0,0 +1,177 @@
+import os
+import re
+import math
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from typing import List
+
+from dotenv import load_dotenv
+
+from services.page_filter import PAGE_BREAK, is_boilerplate, score_page
+
+load_dotenv()
+
+logger = logging.getLogger("PromptCompactor")
+
+# What the RC text may cost in the DeepSeek prompt (~12k characters before compaction)
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+# English text with numbers/addresses averages ~4 characters per token
+CHARS_PER_TOKEN = 4.0
+
+# Header/footer = a line in the first or last few lines of at least half the pages
+EDGE_LINES = 3
+# Only long lines without numbers are deduplicated: short ones ("Pickup", "N/A") label
+# each stop, and a repeated address/time/reference may belong to another stop
+DEDUPE_MIN_CHARS = 40
+
+_PAD_RE = re.compile(r"[ \t\u00a0]{2,}")
+_DIGITS_RE = re.compile(r"\d+")
+
+# Cumulative counters, shown in the admin stats 📊
+stats = {"docs": 0, "tokens_in": 0, "tokens_out": 0}
+
+
+@dataclass
+class CompactResult:
+    text: str
+    tokens_in: int
+    tokens_out: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_in - self.tokens_out
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _clean_line(line: str) -> str:
+    # layout=True pads columns with long runs of spaces; two keep columns apart
+    return _PAD_RE.sub("  ", line).strip()
+
+
+def _edge_key(line: str) -> str:
+    """'Page 2 of 5' and 'Page 3 of 5' are the same footer."""
+    return _DIGITS_RE.sub("#", line.lower())
+
+
+def _repeated_edges(pages: List[List[str]]) -> set:
+    if len(pages) < 2:
+        return set()
+    counts = Counter()
+    for lines in pages:
+        body = [l for l in lines if l]
+        counts.update({_edge_key(l) for l in body[:EDGE_LINES] + body[-EDGE_LINES:]})
+    return {k for k, n in counts.items() if n >= max(2, math.ceil(len(pages) / 2))}
+
+
+def _sections(pages: List[List[str]]) -> List[str]:
+    """Blank-line separated blocks, in document order."""
+    sections = []
+    for lines in pages:
+        block = []
+        for line in lines + [""]:
+            if line:
+                block.append(line)
+            elif block:
+                sections.append("\n".join(block))
+                block = []
+    return sections
+
+
+def _prioritize(sections: List[str], budget_chars: int) -> List[str]:
+    """
+    Keeps the first section (broker/load header) and then the sections
+    richest in stop/rate keywords until the budget is spent. Output stays
+    in document order so stops remain in sequence.
+    """
+    candidates = [i for i, s in enumerate(sections) if i == 0 or not is_boilerplate(s)]
+    ranked = sorted(candidates, key=lambda i: (i != 0, -score_page(sections[i])))
+
+    keep, left = {}, budget_chars
+    for i in ranked:
+        if left <= 0:
+            break
+        part = sections[i]
+        if len(part) > left:
+            # Cut at a line boundary when possible, half an address is worse than none
+            part = part[:left]
+            if "\n" in part:
+                part = part[:part.rfind("\n")]
+            elif keep:
+                continue
+        keep[i] = part
+        left -= len(part) + 2
+    return [keep[i] for i in sorted(keep)]
+
+
+def compact(text: str, token_budget: int = PROMPT_TOKEN_BUDGET) -> CompactResult:
+    """
+    Shrinks extracted RC text before it goes into the LLM prompt:
+    drops carrier terms pages, collapses layout padding, removes headers/footers
+    repeated across pages and long duplicate lines, then fills the token budget
+    keyword-rich sections first.
+    """
+    text = text or ""
+    raw_pages = text.split(PAGE_BREAK)
+    # Carrier terms pages carry no load data (the first page always stays)
+    raw_pages = [p for i, p in enumerate(raw_pages) if i == 0 or not is_boilerplate(p)]
+    pages = [[_clean_line(l) for l in page.splitlines()] for page in raw_pages]
+
+    edges = _repeated_edges(pages)
+    seen_edges, seen_lines = set(), set()
+    for lines in pages:
+        body = [i for i, l in enumerate(lines) if l]
+        edge_rows = set(body[:EDGE_LINES] + body[-EDGE_LINES:])
+        for i in body:
+            line = lines[i]
+            key = _edge_key(line)
+            if i in edge_rows and key in edges:
+                # Keep the first occurrence: page 1's header often is the broker name
+                if key in seen_edges:
+                    lines[i] = ""
+                seen_edges.add(key)
+            elif len(line) >= DEDUPE_MIN_CHARS and not _DIGITS_RE.search(line):
+                if line in seen_lines:
+                    lines[i] = ""
+                seen_lines.add(line)
+
+    compacted = "\n\n".join(_sections(pages))
+    budget_chars = int(token_budget * CHARS_PER_TOKEN)
+    if len(compacted) > budget_chars:
+        compacted = "\n\n".join(_prioritize(compacted.split("\n\n"), budget_chars))
+
+    result = CompactResult(compacted, estimate_tokens(text), estimate_tokens(compacted))
+    stats["docs"] += 1
+    stats["tokens_in"] += result.tokens_in
+    stats["tokens_out"] += result.tokens_out
+    logger.info(
+        "✂️ Prompt compaction: ~%d -> ~%d tokens (saved ~%d, %.0f%%)",
+        result.tokens_in, result.tokens_out, result.tokens_saved,
+        100.0 * result.tokens_saved / result.tokens_in if result.tokens_in else 0.0,
+    )
+    return result
+
+
+def excerpt(text: str, pattern: "re.Pattern", token_budget: int, context: int = 2, head: int = 0) -> str:
+    """
+    Only the lines around `pattern` hits (plus the first `head` lines), for
+    small follow-up prompts. Not counted in the compaction stats.
+    """
+    lines = [l for l in (_clean_line(l) for l in (text or "").replace(PAGE_BREAK, "\n").splitlines()) if l]
+    wanted = set(range(min(head, len(lines))))
+    for i, line in enumerate(lines):
+        if pattern.search(line):
+            wanted.update(range(max(0, i - context), min(len(lines), i + context + 1)))
+
+    out, left = [], int(token_budget * CHARS_PER_TOKEN)
+    for i in sorted(wanted):
+        if len(lines[i]) + 1 > left:
+            break
+        if out and i - 1 not in wanted:
+            out.append("...")
+        out.append(lines[i])
+        left -= len(lines[i]) + 1
+    return "\n".join(out)
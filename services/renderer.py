@@ -90,9 +90,13 @@ def render_result(data: dict, user_template: str = None) -> str:
     
     # 1. Aggressive Miles cleaning
     raw_miles = str(data.get("total_miles") or "0").lower().replace('mi', '').replace(',', '').strip()
+    # Offline estimate (routing was down): show it as approximate
+    approx = "~" if data.get("miles_estimated") else ""
     try:
         miles_float = float(raw_miles)
-        miles_display = f"{miles_float} mi" if miles_float > 0 else "N/A"
+        miles_display = f"{approx}{miles_float} mi" if miles_float > 0 else "N/A"
+        if approx and miles_float > 0:
+            miles_display += " (est.)"
     except:
         miles_float = 0
         miles_display = "N/A"
@@ -103,7 +107,7 @@ def render_result(data: dict, user_template: str = None) -> str:
     try:
         rate_float = float(rate_clean)
         rate_display = f"${rate_float:,.2f}"
-        per_mile = f"${round(rate_float / miles_float, 2)}/mi" if miles_float > 0 else "N/A"
+        per_mile = f"{approx}${round(rate_float / miles_float, 2)}/mi" if miles_float > 0 else "N/A"
     except:
         rate_display = raw_rate if raw_rate != "0" and raw_rate != "0.00" else "N/A"
         per_mile = "N/A"
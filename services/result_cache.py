@@ -0,0 +1,120 @@
+import os
+import re
+import json
+import hashlib
+import itertools
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import select, delete, func, update
+from sqlalchemy.exc import IntegrityError
+
+from database.connection import AsyncSessionLocal
+from database.models import ExtractionCache
+
+load_dotenv()
+
+logger = logging.getLogger("ResultCache")
+
+# Off by default: entries hold the extracted broker, rate and stops, which /privacy
+# (handlers/start.py) says we don't keep. Set it above 0 only together with an updated PRIVACY_TEXT.
+RESULT_CACHE_TTL_HOURS = float(os.getenv("RESULT_CACHE_TTL_HOURS", "0"))
+ENABLED = RESULT_CACHE_TTL_HOURS > 0
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "5000"))
+# prune() is a DELETE, a COUNT and an LRU DELETE, so writes only trigger it
+# every N puts; main.py's periodic cleanup covers quiet periods
+RESULT_CACHE_PRUNE_EVERY = max(1, int(os.getenv("RESULT_CACHE_PRUNE_EVERY", "50")))
+
+# In-process counters, shown in the admin stats 📊
+stats = {"hits": 0, "misses": 0}
+
+_WS_RE = re.compile(r"\s+")
+_writes = itertools.count(1)
+
+
+def text_key(text: str) -> str:
+    """
+    Hash of the text with layout whitespace collapsed, so a re-sent RC
+    that differs only in padding/line breaks maps to the same entry.
+    """
+    normalized = _WS_RE.sub(" ", text or "").strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+async def get(key: str) -> Optional[dict]:
+    if not ENABLED:
+        return None
+    cutoff = datetime.utcnow() - timedelta(hours=RESULT_CACHE_TTL_HOURS)
+    try:
+        async with AsyncSessionLocal() as session:
+            res = await session.execute(
+                select(ExtractionCache).where(ExtractionCache.text_hash == key)
+            )
+            entry = res.scalar_one_or_none()
+
+            if entry is None or entry.created_at < cutoff:
+                stats["misses"] += 1
+                return None
+
+            await session.execute(
+                update(ExtractionCache)
+                .where(ExtractionCache.id == entry.id)
+                .values(hits=ExtractionCache.hits + 1, last_used_at=datetime.utcnow())
+            )
+            await session.commit()
+            payload = json.loads(entry.payload)
+    except Exception as e:
+        logger.warning("Result cache read failed: %s", e)
+        stats["misses"] += 1
+        return None
+
+    stats["hits"] += 1
+    logger.info("⚡ Extraction cache hit %s (hits %d / misses %d)", key[:12], stats["hits"], stats["misses"])
+    return payload
+
+
+async def put(key: str, data: dict):
+    if not ENABLED:
+        return
+    try:
+        async with AsyncSessionLocal() as session:
+            await session.execute(delete(ExtractionCache).where(ExtractionCache.text_hash == key))
+            session.add(ExtractionCache(text_hash=key, payload=json.dumps(data)))
+            await session.commit()
+    except IntegrityError:
+        # Another worker cached the same document at the same moment
+        pass
+    except Exception as e:
+        logger.warning("Result cache write failed: %s", e)
+        return
+
+    if next(_writes) % RESULT_CACHE_PRUNE_EVERY == 0:
+        await prune()
+
+
+async def prune():
+    """
+    Drops expired rows, then the least recently used ones above the size cap.
+    With the cache disabled every row is expired, so results left from before go too.
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=RESULT_CACHE_TTL_HOURS)
+    try:
+        async with AsyncSessionLocal() as session:
+            await session.execute(delete(ExtractionCache).where(ExtractionCache.created_at < cutoff))
+
+            count = (await session.execute(select(func.count(ExtractionCache.id)))).scalar() or 0
+            excess = count - RESULT_CACHE_MAX_ENTRIES
+            if excess > 0:
+                oldest = (
+                    select(ExtractionCache.id)
+                    .order_by(ExtractionCache.last_used_at.asc())
+                    .limit(excess)
+                    .scalar_subquery()
+                )
+                await session.execute(delete(ExtractionCache).where(ExtractionCache.id.in_(oldest)))
+
+            await session.commit()
+    except Exception as e:
+        logger.warning("Result cache prune failed: %s", e)
@@ -0,0 +1,150 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import select, delete, update
+from sqlalchemy.exc import IntegrityError
+
+from database.connection import AsyncSessionLocal
+from database.models import RouteCache
+
+load_dotenv()
+
+logger = logging.getLogger("RouteCache")
+
+Coords = Tuple[float, float]
+
+# Road distances between two docks don't change week to week; recurring
+# lanes are served from here without touching OSRM.
+ROUTE_CACHE_TTL_DAYS = float(os.getenv("ROUTE_CACHE_TTL_DAYS", "90"))
+ROUTE_LRU_SIZE = int(os.getenv("ROUTE_LRU_SIZE", "4096"))
+# 4 decimals ~ 11 m: the same facility geocodes to the same key, different docks don't collide
+ROUTE_COORD_PRECISION = int(os.getenv("ROUTE_COORD_PRECISION", "4"))
+
+# In-process LRU in front of the table: leg key -> (miles, expires_at)
+_lru: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+# Counted per leg, shown in the admin stats 📊
+stats = {"hits": 0, "misses": 0}
+
+
+def leg_key(origin: Coords, destination: Coords) -> str:
+    """Directed key: A->B and B->A are separate legs (one-way streets, ramps)."""
+    p = ROUTE_COORD_PRECISION
+    return f"{origin[0]:.{p}f},{origin[1]:.{p}f};{destination[0]:.{p}f},{destination[1]:.{p}f}"
+
+
+def sequence_keys(points: Sequence[Coords]) -> List[str]:
+    """Waypoint sequence -> one key per consecutive leg."""
+    return [leg_key(points[i], points[i + 1]) for i in range(len(points) - 1)]
+
+
+def _lru_get(key: str) -> Optional[float]:
+    item = _lru.get(key)
+    if item is None:
+        return None
+    miles, expires_at = item
+    if expires_at < time.time():
+        _lru.pop(key, None)
+        return None
+    _lru.move_to_end(key)
+    return miles
+
+
+def _lru_put(key: str, miles: float, ttl_seconds: float):
+    _lru[key] = (miles, time.time() + ttl_seconds)
+    _lru.move_to_end(key)
+    while len(_lru) > ROUTE_LRU_SIZE:
+        _lru.popitem(last=False)
+
+
+async def _db_get_many(keys: List[str]) -> Dict[str, Tuple[float, float]]:
+    """key -> (miles, seconds of TTL left) for every live row among `keys`."""
+    ttl = ROUTE_CACHE_TTL_DAYS * 86400
+    now = datetime.utcnow()
+    found = {}
+    async with AsyncSessionLocal() as session:
+        res = await session.execute(select(RouteCache).where(RouteCache.leg_key.in_(keys)))
+        for row in res.scalars():
+            left = ttl - (now - row.updated_at).total_seconds()
+            if left > 0:
+                found[row.leg_key] = (row.miles, left)
+
+        if found:
+            await session.execute(
+                update(RouteCache)
+                .where(RouteCache.leg_key.in_(list(found)))
+                .values(hits=RouteCache.hits + 1)
+            )
+            await session.commit()
+    return found
+
+
+async def get_legs(points: Sequence[Coords]) -> Optional[List[float]]:
+    """
+    Cached miles for every leg of the waypoint sequence, or None if any
+    leg is unknown (the whole trip then goes to OSRM in one request).
+    """
+    keys = sequence_keys(points)
+    if not keys:
+        return None
+
+    legs: Dict[str, float] = {}
+    for key in keys:
+        miles = _lru_get(key)
+        if miles is not None:
+            legs[key] = miles
+
+    missing = [k for k in dict.fromkeys(keys) if k not in legs]
+    if missing:
+        try:
+            for key, (miles, left) in (await _db_get_many(missing)).items():
+                _lru_put(key, miles, left)
+                legs[key] = miles
+        except Exception as e:
+            logger.warning("Route cache read failed: %s", e)
+
+    hits = sum(1 for k in keys if k in legs)
+    stats["hits"] += hits
+    stats["misses"] += len(keys) - hits
+    if hits < len(keys):
+        return None
+
+    logger.info("⚡ Route cache hit for %d leg(s) (hits %d / misses %d)", len(keys), stats["hits"], stats["misses"])
+    return [legs[k] for k in keys]
+
+
+async def put_legs(points: Sequence[Coords], legs: Sequence[float]):
+    keys = sequence_keys(points)
+    if len(keys) != len(legs):
+        return
+
+    fresh = dict(zip(keys, legs))
+    for key, miles in fresh.items():
+        _lru_put(key, miles, ROUTE_CACHE_TTL_DAYS * 86400)
+
+    try:
+        async with AsyncSessionLocal() as session:
+            await session.execute(delete(RouteCache).where(RouteCache.leg_key.in_(list(fresh))))
+            session.add_all(RouteCache(leg_key=k, miles=m, updated_at=datetime.utcnow()) for k, m in fresh.items())
+            await session.commit()
+    except IntegrityError:
+        # Another worker routed the same lane at the same moment
+        pass
+    except Exception as e:
+        logger.warning("Route cache write failed: %s", e)
+
+
+async def prune():
+    """Drops legs older than the TTL."""
+    cutoff = datetime.utcnow() - timedelta(days=ROUTE_CACHE_TTL_DAYS)
+    try:
+        async with AsyncSessionLocal() as session:
+            await session.execute(delete(RouteCache).where(RouteCache.updated_at < cutoff))
+            await session.commit()
+    except Exception as e:
+        logger.warning("Route cache prune failed: %s", e)
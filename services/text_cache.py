@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import hashlib
+import itertools
+import logging
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger("TextCache")
+
+# Content-addressed cache: <sha256 of PDF bytes>.json holds the extracted text,
+# ids/<file_unique_id> points at the sha so repeat forwards skip the download too.
+TEXT_CACHE_DIR = os.getenv("TEXT_CACHE_DIR", os.path.join("cache", "text"))
+TEXT_CACHE_MAX_MB = int(os.getenv("TEXT_CACHE_MAX_MB", "200"))
+# Off by default: this stores full RC text on disk, which /privacy (handlers/start.py)
+# says we don't keep. Set it above 0 only together with an updated PRIVACY_TEXT.
+TEXT_CACHE_TTL_HOURS = float(os.getenv("TEXT_CACHE_TTL_HOURS", "0"))
+ENABLED = TEXT_CACHE_TTL_HOURS > 0
+# prune() scans the whole directory, so writes only trigger it every N puts;
+# main.py's periodic cleanup covers quiet periods
+TEXT_CACHE_PRUNE_EVERY = max(1, int(os.getenv("TEXT_CACHE_PRUNE_EVERY", "50")))
+
+_IDS_DIR = os.path.join(TEXT_CACHE_DIR, "ids")
+# put() runs in worker threads; next() on a count is atomic under the GIL
+_writes = itertools.count(1)
+
+
+def sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _entry_path(digest: str) -> str:
+    return os.path.join(TEXT_CACHE_DIR, f"{digest}.json")
+
+
+def _alias_path(file_unique_id: str) -> str:
+    # file_unique_id is URL-safe base64, but never trust it as a path blindly
+    safe = "".join(c for c in file_unique_id if c.isalnum() or c in "-_")
+    return os.path.join(_IDS_DIR, safe)
+
+
+def get(digest: str) -> Optional[str]:
+    """Returns cached text for the PDF hash, or None if missing/expired."""
+    if not ENABLED:
+        return None
+    path = _entry_path(digest)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    now = time.time()
+    if now - entry.get("created", 0) > TEXT_CACHE_TTL_HOURS * 3600:
+        _remove(path)
+        return None
+
+    # mtime stays the creation time (TTL), atime is "last used" (LRU).
+    # Set explicitly so noatime/relatime mounts don't matter.
+    try:
+        os.utime(path, (now, os.stat(path).st_mtime))
+    except OSError:
+        pass
+    return entry.get("text")
+
+
+def get_by_file_id(file_unique_id: Optional[str]) -> Optional[str]:
+    """Lookup by Telegram's file_unique_id — lets us skip even the download."""
+    if not file_unique_id or not ENABLED:
+        return None
+    try:
+        with open(_alias_path(file_unique_id), "r") as f:
+            digest = f.read().strip()
+    except OSError:
+        return None
+    return get(digest)
+
+
+def put(digest: str, text: str, file_unique_id: Optional[str] = None):
+    # Empty text means extraction failed; let the next upload retry it
+    if not text or not ENABLED:
+        return
+    try:
+        os.makedirs(_IDS_DIR, exist_ok=True)
+        tmp = _entry_path(digest) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "text": text}, f)
+        os.replace(tmp, _entry_path(digest))
+
+        if file_unique_id:
+            with open(_alias_path(file_unique_id), "w") as f:
+                f.write(digest)
+    except OSError as e:
+        logger.warning("Text cache write failed: %s", e)
+        return
+
+    if next(_writes) % TEXT_CACHE_PRUNE_EVERY == 0:
+        prune()
+
+
+def prune():
+    """
+    Drops expired entries, then least-recently-used ones until under the size cap.
+    With the cache disabled everything is expired, so text left from before goes too.
+    """
+    if not os.path.isdir(TEXT_CACHE_DIR):
+        return
+
+    now = time.time()
+    ttl = TEXT_CACHE_TTL_HOURS * 3600
+    entries = []
+    for name in os.listdir(TEXT_CACHE_DIR):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(TEXT_CACHE_DIR, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if now - st.st_mtime > ttl:
+            _remove(path)
+            continue
+        entries.append((st.st_atime, st.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    limit = TEXT_CACHE_MAX_MB * 1024 * 1024
+    if total > limit:
+        for _, size, path in sorted(entries):
+            _remove(path)
+            total -= size
+            if total <= limit:
+                break
+
+    # Aliases pointing at evicted entries are useless now
+    if os.path.isdir(_IDS_DIR):
+        for name in os.listdir(_IDS_DIR):
+            path = os.path.join(_IDS_DIR, name)
+            try:
+                with open(path, "r") as f:
+                    digest = f.read().strip()
+            except OSError:
+                continue
+            if not os.path.exists(_entry_path(digest)):
+                _remove(path)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,103 @@
+import textwrap
+
+from services.broker_parsers import RegexLayoutParser, parse_known_broker
+
+# Example spec for the registry's mechanics; no broker layout ships until one
+# is built from real pdfplumber layout=True output
+LAYOUT = {
+    "broker": "Example Logistics",
+    "fingerprints": [r"Example\s+Logistics", r"Load\s+Confirmation"],
+    "fields": {
+        "load_number": r"Load\s*(?:Number|#)\s*:?[ \t]*(\d{6,10})\b",
+        "rate": r"Total\s+Carrier\s+Pay\s*:?[ \t]*\$[ \t]*([\d,]+\.\d{2})",
+        "weight": r"Weight\s*:?[ \t]*([\d,]+[ \t]*lbs)",
+        "pu_number": r"Pick[ \t]*Up[ \t]*#[ \t]*:?[ \t]*([A-Z0-9-]{3,})",
+        "del_number": r"Delivery[ \t]*#[ \t]*:?[ \t]*([A-Z0-9-]{3,})",
+        "bol_number": r"BOL[ \t]*#[ \t]*:?[ \t]*([A-Z0-9-]{3,})",
+        "ref_number": r"PO[ \t]*#[ \t]*:?[ \t]*([A-Z0-9-]{3,})",
+    },
+    "stops": (
+        r"^[ \t]*Stop[ \t]+\d+[ \t]*-[ \t]*(?P<kind>Pick[ \t]*Up|Delivery)[ \t]*\n"
+        r"[ \t]*(?P<facility>[^\n]+)\n"
+        r"[ \t]*(?P<address>[^\n]+,[ \t]*[A-Z]{2}[ \t]+\d{5})[ \t]*\n"
+        r"[ \t]*(?P<time>\d{1,2}/\d{1,2}/\d{4}[ \t]+\d{1,2}:\d{2})"
+    ),
+    "stop_headers": r"^[ \t]*Stop[ \t]+\d+\b",
+}
+
+RC = """EXAMPLE LOGISTICS, LLC
+LOAD CONFIRMATION
+Load Number: 31274458
+PO #: 4500123987
+Weight: 42,000 lbs
+Stop 1 - Pick Up
+ACME FOODS DC
+1200 Industrial Pkwy, Dallas, TX 75212
+10/21/2026 08:00
+Pick Up #: PU88231
+Stop 2 - Delivery
+KROGER DC 014
+500 Distribution Dr, Memphis, TN 38118
+10/22/2026 14:30
+Delivery #: D55120
+BOL #: BOL77310
+Total Carrier Pay: $2,150.00
+"""
+
+THIRD_STOP = """Stop 3 - Delivery
+KROGER DC 022
+Building 4, 77 Commerce Way
+Nashville, TN 37210
+10/23/2026 09:00
+"""
+
+
+def _parse(text):
+    return parse_known_broker(text, parsers=[RegexLayoutParser(LAYOUT)])
+
+
+def test_layout_parses_all_fields():
+    data, confidence, name = _parse(RC)
+    assert name == "Example Logistics"
+    assert confidence == 1.0
+    assert data["load_number"] == "31274458"
+    assert data["rate"] == "2,150.00"
+    assert data["weight"] == "42,000 lbs"
+    assert (data["pu_number"], data["del_number"], data["bol_number"], data["ref_number"]) == (
+        "PU88231", "D55120", "BOL77310", "4500123987"
+    )
+    assert data["pickups"] == [
+        {"facility": "ACME FOODS DC", "address": "1200 Industrial Pkwy, Dallas, TX 75212", "time": "10/21/2026 08:00"}
+    ]
+    assert data["deliveries"] == [
+        {"facility": "KROGER DC 014", "address": "500 Distribution Dr, Memphis, TN 38118", "time": "10/22/2026 14:30"}
+    ]
+
+
+def test_indented_layout_text_parses():
+    # pdfplumber's layout=True pads lines with leading spaces
+    data, confidence, _ = _parse(textwrap.indent(RC, "      "))
+    assert confidence == 1.0
+    assert len(data["pickups"]) == 1 and len(data["deliveries"]) == 1
+
+
+def test_missed_stop_falls_back_to_the_llm():
+    # The third stop's address spans two lines, so the stop pattern skips it
+    data, confidence, _ = _parse(RC.replace("BOL #", THIRD_STOP + "BOL #"))
+    assert data is None
+    assert confidence < 0.8
+
+
+def test_other_brokers_fall_back_to_the_llm():
+    data, _, name = _parse("ACME FREIGHT\nRate Confirmation\nLoad # 123456\nRate: $900.00\n")
+    assert data is None and name is None
+
+
+def test_failing_parser_is_skipped():
+    class Broken(RegexLayoutParser):
+        def parse(self, text):
+            raise ValueError("boom")
+
+    broken = Broken({"broker": "Broken", "fingerprints": ["LOAD CONFIRMATION"]})
+    data, _, name = parse_known_broker(RC, parsers=[broken, RegexLayoutParser(LAYOUT)])
+    assert name == "Example Logistics" and data is not None
@@ -0,0 +1,116 @@
+import json
+from typing import Any, List, Optional, Tuple
+
+# (kind, key, value):
+#   ("field", "broker", "ACME")         a top-level value is complete
+#   ("item", "pickups", {...})          one element of a top-level array is complete
+Event = Tuple[str, str, Any]
+
+_WS = " \t\r\n"
+
+
+class _Frame:
+    __slots__ = ("kind", "start", "key", "expect_key")
+
+    def __init__(self, kind: str, start: int, key: Optional[str]):
+        self.kind = kind          # "{" or "["
+        self.start = start
+        self.key = key            # object: current member key; array: its key in the parent
+        self.expect_key = kind == "{"
+
+
+class IncrementalJSONParser:
+    """
+    Feed an LLM's JSON answer chunk by chunk and get each top-level field
+    (and each element of top-level arrays) the moment it is complete,
+    long before the closing brace arrives. 🧩
+    Text before the first '{' (```json fences, chatter) is ignored.
+    """
+
+    def __init__(self):
+        self.buf = ""
+        self._pos = 0
+        self._frames: List[_Frame] = []
+        self._started = False
+        self._done = False
+        self._in_string = False
+        self._escape = False
+        self._str_start = 0
+        self._scalar_start: Optional[int] = None
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def feed(self, chunk: str) -> List[Event]:
+        self.buf += chunk
+        events: List[Event] = []
+        buf = self.buf
+        i = self._pos
+
+        while i < len(buf) and not self._done:
+            c = buf[i]
+
+            if not self._started:
+                if c == "{":
+                    self._started = True
+                    self._frames.append(_Frame("{", i, None))
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    frame = self._frames[-1]
+                    if frame.kind == "{" and frame.expect_key:
+                        frame.key = json.loads(buf[self._str_start:i + 1])
+                    else:
+                        self._value_end(self._str_start, i + 1, events)
+                i += 1
+                continue
+
+            if self._scalar_start is not None and (c in _WS or c in ",}]"):
+                self._value_end(self._scalar_start, i, events)
+                self._scalar_start = None
+
+            if c == '"':
+                self._in_string = True
+                self._str_start = i
+            elif c == ":":
+                self._frames[-1].expect_key = False
+            elif c == ",":
+                if self._frames[-1].kind == "{":
+                    self._frames[-1].expect_key = True
+            elif c in "{[":
+                parent = self._frames[-1]
+                self._frames.append(_Frame(c, i, parent.key if parent.kind == "{" else None))
+            elif c in "}]":
+                frame = self._frames.pop()
+                if not self._frames:
+                    self._done = True
+                else:
+                    self._value_end(frame.start, i + 1, events)
+            elif c not in _WS and self._scalar_start is None:
+                self._scalar_start = i
+            i += 1
+
+        self._pos = i
+        return events
+
+    def _value_end(self, start: int, end: int, events: List[Event]):
+        depth = len(self._frames)
+        parent = self._frames[-1]
+        if depth > 2 or (depth == 2 and self._frames[0].kind != "{"):
+            return
+        try:
+            value = json.loads(self.buf[start:end])
+        except ValueError:
+            return
+        if depth == 1 and parent.kind == "{" and parent.key is not None:
+            events.append(("field", parent.key, value))
+        elif depth == 2 and parent.kind == "[" and parent.key is not None:
+            events.append(("item", parent.key, value))
@@ -0,0 +1,51 @@
+import time
+import asyncio
+
+
+class TokenBucket:
+    """
+    Async token bucket: `rate` tokens per second, bursts up to `capacity`.
+    Waiters are served in arrival order (the lock is FIFO), so a steady
+    stream of callers can't starve an early one. 🪣
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Takes tokens only if they are available right now."""
+        if self._lock.locked():
+            return False
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    def delay(self, tokens: float = 1.0) -> float:
+        """Seconds until `tokens` would be available (0 if now). Takes nothing."""
+        self._refill()
+        return max(0.0, (tokens - self._tokens) / self.rate)
+
+    def full(self) -> bool:
+        self._refill()
+        return self._tokens >= self.capacity
+
+    async def acquire(self, tokens: float = 1.0):
+        """Waits until `tokens` are available and takes them. Cancel-safe."""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
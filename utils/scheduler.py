@@ -0,0 +1,163 @@
+import asyncio
+import itertools
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger("Scheduler")
+
+
+class FairScheduler:
+    """
+    One global queue for every user's jobs, drained by a fixed pool of workers.
+
+    Users are served by smooth weighted round-robin: each user's share of the
+    workers follows the weight of their priority class, no matter how many
+    jobs they queued, so one big batch can't starve everyone else. A user
+    never has more than `per_user_cap` jobs running at once; within a user,
+    jobs run in arrival order. ⚖️
+    """
+
+    def __init__(
+        self,
+        run: Callable[[Any], Awaitable[None]],
+        workers: int,
+        weights: Dict[str, int],
+        per_user_cap: int = 1,
+        default_class: Optional[str] = None,
+    ):
+        self._run = run
+        self._n_workers = max(1, workers)
+        self._weights = weights
+        self._cap = max(1, per_user_cap)
+        self._default_class = default_class or min(weights, key=weights.get)
+
+        self._queues: Dict[Hashable, deque] = {}
+        self._class: Dict[Hashable, str] = {}
+        self._credit: Dict[Hashable, float] = {}
+        self._inflight: Dict[Hashable, int] = {}
+        self._seq = itertools.count()
+        self._cond = asyncio.Condition()
+        self._workers: List[asyncio.Task] = []
+
+    # ---------- lifecycle ----------
+    def start(self):
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self._n_workers)]
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    # ---------- queueing ----------
+    async def submit(self, user: Hashable, item: Any, priority: Optional[str] = None):
+        async with self._cond:
+            self._class[user] = priority if priority in self._weights else self._default_class
+            self._queues.setdefault(user, deque()).append((next(self._seq), item))
+            self._cond.notify()
+
+    def _weight(self, user) -> int:
+        return self._weights.get(self._class.get(user), 1)
+
+    @staticmethod
+    def _pick(eligible: List[Hashable], credit: Dict[Hashable, float], weight, head_seq) -> Hashable:
+        """Smooth weighted round-robin (as in nginx): ties go to the oldest waiting job."""
+        total = 0
+        for user in eligible:
+            credit[user] = credit.get(user, 0.0) + weight(user)
+            total += weight(user)
+        best = max(eligible, key=lambda u: (credit[u], -head_seq(u)))
+        credit[best] -= total
+        return best
+
+    def _eligible(self, queues, inflight) -> List[Hashable]:
+        return [u for u, q in queues.items() if q and inflight.get(u, 0) < self._cap]
+
+    async def _next(self):
+        async with self._cond:
+            while True:
+                eligible = self._eligible(self._queues, self._inflight)
+                if eligible:
+                    user = self._pick(eligible, self._credit, self._weight, lambda u: self._queues[u][0][0])
+                    _, item = self._queues[user].popleft()
+                    self._inflight[user] = self._inflight.get(user, 0) + 1
+                    return user, item
+                await self._cond.wait()
+
+    async def _worker(self):
+        while True:
+            user, item = await self._next()
+            try:
+                await self._run(item)
+            except Exception:
+                logger.exception("Job for %s failed", user)
+            finally:
+                async with self._cond:
+                    self._inflight[user] -= 1
+                    if not self._inflight[user] and not self._queues.get(user):
+                        # Idle users start from zero next time (no saved-up credit or debt)
+                        self._inflight.pop(user, None)
+                        self._queues.pop(user, None)
+                        self._credit.pop(user, None)
+                        self._class.pop(user, None)
+                    self._cond.notify_all()
+
+    # ---------- introspection ----------
+    def _dispatch_order(self, extra_user: Hashable = None, extra_class: Optional[str] = None) -> List[Tuple[Any, int]]:
+        """
+        The order waiting jobs will start in, replaying the same round-robin
+        on a copy of the state, as (item, position) pairs. Position 0 means an
+        idle worker takes it right away; otherwise it's the place in line for
+        a worker to free up. Users at their cap only get a job started once
+        one of theirs finishes (assumed to happen in turn).
+        `extra_user` adds a phantom job (item None) at the end of that user's queue.
+        """
+        queues = {u: deque(q) for u, q in self._queues.items() if q}
+        classes = dict(self._class)
+        if extra_user is not None:
+            queues.setdefault(extra_user, deque()).append((next(self._seq), None))
+            classes.setdefault(extra_user, extra_class if extra_class in self._weights else self._default_class)
+
+        credit = dict(self._credit)
+        inflight = dict(self._inflight)
+        idle = max(0, self._n_workers - sum(inflight.values()))
+        weight = lambda u: self._weights.get(classes.get(u), 1)
+        order, waiting = [], 0
+        while queues:
+            eligible = self._eligible(queues, inflight)
+            if not eligible:
+                # Everyone left is capped: one running job per such user finishes,
+                # and its worker (not an idle one) takes the next job
+                for user in queues:
+                    inflight[user] = min(inflight.get(user, 0), self._cap) - 1
+                idle = 0
+                continue
+            user = self._pick(eligible, credit, weight, lambda u: queues[u][0][0])
+            item = queues[user].popleft()[1]
+            inflight[user] = inflight.get(user, 0) + 1
+            if idle:
+                idle -= 1
+                order.append((item, 0))
+            else:
+                waiting += 1
+                order.append((item, waiting))
+            if not queues[user]:
+                del queues[user]
+        return order
+
+    def positions(self) -> Dict[int, int]:
+        """id(item) -> place in line among waiting jobs (1-based; 0 = starts as soon as a worker picks it up)."""
+        return {id(item): pos for item, pos in self._dispatch_order()}
+
+    def position_for_new(self, user: Hashable, priority: Optional[str] = None) -> int:
+        """Where a job submitted right now by `user` would land (0 = an idle worker takes it)."""
+        return next(pos for item, pos in self._dispatch_order(user, priority) if item is None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "waiting": sum(len(q) for q in self._queues.values()),
+            "running": sum(self._inflight.values()),
+            "users": len([u for u, q in self._queues.items() if q]),
+        }
@@ -0,0 +1,213 @@
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+
+from utils.rate_limit import TokenBucket
+
+logger = logging.getLogger("TgOutbox")
+
+# Lower goes first: a finished result never waits behind someone's status edits
+RESULT, DELETE, EDIT = 0, 1, 2
+
+
+@dataclass
+class _Call:
+    factory: Callable[[], Awaitable[Any]]
+    priority: int
+    seq: int
+    key: Optional[Hashable]
+    future: asyncio.Future
+    attempts: int = 0
+
+    def __lt__(self, other: "_Call") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+def _resolve(future: asyncio.Future, result: Any = None, error: Optional[BaseException] = None):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+@dataclass
+class _Chat:
+    bucket: TokenBucket
+    queue: List[_Call] = field(default_factory=list)   # heap
+    busy: bool = False
+    blocked_until: float = 0.0
+
+
+class TelegramOutbox:
+    """
+    Every outbound Bot API call, paced to Telegram's limits: a global bucket
+    (~30/s), one per private chat (~1/s) and one per group (20/min).
+
+    Calls to different chats run in parallel; within a chat they run one at a
+    time, by priority then arrival. Calls sharing a `key` (edits/deletes of
+    the same message) are coalesced: a newer one replaces the pending one, so
+    a backed-up chat only sends the latest status. Flood waits (RetryAfter)
+    pause just that chat. 📤
+    """
+
+    def __init__(
+        self,
+        global_rate: float,
+        chat_rate: float,
+        group_rate: float,
+        chat_burst: float = 1.0,
+        max_retries: int = 6,
+    ):
+        self._global = TokenBucket(global_rate, capacity=max(1.0, global_rate))
+        self._chat_rate = chat_rate
+        self._chat_burst = max(1.0, chat_burst)
+        self._group_rate = group_rate
+        self._max_retries = max_retries
+        self._chats: Dict[int, _Chat] = {}
+        self._pending: Dict[Hashable, _Call] = {}
+        self._seq = itertools.count()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    # ---------- lifecycle ----------
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._dispatch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for chat in self._chats.values():
+            for call in chat.queue:
+                call.future.cancel()
+        self._chats.clear()
+        self._pending.clear()
+
+    # ---------- submitting ----------
+    def submit(
+        self,
+        chat_id: int,
+        factory: Callable[[], Awaitable[Any]],
+        priority: int = EDIT,
+        key: Optional[Hashable] = None,
+    ) -> asyncio.Future:
+        """Queues a call; the future resolves with its result (or exception)."""
+        self.start()
+        pending = self._pending.get(key) if key is not None else None
+        if pending is not None and not pending.future.done():
+            if priority <= pending.priority:
+                # Latest edit wins; a delete also wins over an edit (but not the other way round)
+                pending.factory = factory
+                pending.priority = priority
+                heapq.heapify(self._chats[chat_id].queue)
+            return pending.future
+
+        future = asyncio.get_running_loop().create_future()
+        # Callers may go away (shielded, see call()); don't warn about unread errors
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        call = _Call(factory, priority, next(self._seq), key, future)
+        self._push(chat_id, call)
+        return future
+
+    async def call(self, chat_id: int, factory, priority: int = EDIT, key: Optional[Hashable] = None):
+        """submit() and wait. Cancelling the caller doesn't withdraw a call others may share."""
+        return await asyncio.shield(self.submit(chat_id, factory, priority, key))
+
+    def _push(self, chat_id: int, call: _Call):
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            # Group and channel ids are negative; 20/min leaves no room for bursts there
+            bucket = TokenBucket(self._group_rate) if chat_id < 0 else TokenBucket(self._chat_rate, self._chat_burst)
+            chat = self._chats[chat_id] = _Chat(bucket)
+        heapq.heappush(chat.queue, call)
+        if call.key is not None:
+            self._pending[call.key] = call
+        self._wake.set()
+
+    # ---------- dispatching ----------
+    def _ready_chat(self) -> Tuple[Optional[int], Optional[float]]:
+        """The chat whose head call should go next, or how long until one can."""
+        now = time.monotonic()
+        best_id, wait = None, None
+        for chat_id, chat in list(self._chats.items()):
+            if chat.busy:
+                continue
+            if not chat.queue:
+                if chat.bucket.full() and chat.blocked_until <= now:
+                    del self._chats[chat_id]
+                continue
+            delay = max(chat.blocked_until - now, chat.bucket.delay())
+            if delay > 0:
+                wait = delay if wait is None else min(wait, delay)
+            elif best_id is None or chat.queue[0] < self._chats[best_id].queue[0]:
+                best_id = chat_id
+        return best_id, wait
+
+    async def _dispatch(self):
+        while True:
+            chat_id, wait = self._ready_chat()
+            if chat_id is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._global.acquire()
+            chat = self._chats[chat_id]
+            call = heapq.heappop(chat.queue)
+            if call.key is not None and self._pending.get(call.key) is call:
+                del self._pending[call.key]
+            if call.future.done():
+                continue
+            chat.bucket.try_acquire()
+            chat.busy = True
+            asyncio.create_task(self._execute(chat_id, chat, call))
+
+    async def _execute(self, chat_id: int, chat: _Chat, call: _Call):
+        try:
+            result = await call.factory()
+        except TelegramRetryAfter as e:
+            logger.warning("⏳ Flood wait %ss for chat %s", e.retry_after, chat_id)
+            chat.blocked_until = time.monotonic() + int(getattr(e, "retry_after", 1)) + 1
+            self._retry(chat_id, call, e)
+        except (TelegramBadRequest, TelegramForbiddenError) as e:
+            # Not modified / message gone / bad markup / bot blocked: retrying won't help
+            _resolve(call.future, error=e)
+        except Exception as e:
+            chat.blocked_until = time.monotonic() + 1
+            self._retry(chat_id, call, e)
+        else:
+            _resolve(call.future, result)
+        finally:
+            chat.busy = False
+            self._wake.set()
+
+    def _retry(self, chat_id: int, call: _Call, error: Exception):
+        call.attempts += 1
+        if call.attempts >= self._max_retries:
+            _resolve(call.future, error=error)
+        elif call.key is not None and call.key in self._pending:
+            # A newer call for the same message is already queued
+            _resolve(call.future)
+        else:
+            self._push(chat_id, call)
+
+    # ---------- introspection ----------
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": sum(len(c.queue) for c in self._chats.values()),
+            "inflight": sum(1 for c in self._chats.values() if c.busy),
+            "chats": len(self._chats),
+        }
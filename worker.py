@@ -0,0 +1,71 @@
+"""
+Extraction worker for the shared job queue (JOB_QUEUE_MODE=shared).
+
+    JOB_QUEUE_MODE=shared python main.py      # one polling process: uploads in, results out
+    JOB_QUEUE_MODE=shared python worker.py    # any number of these, on any box, same DATABASE_URL
+
+Each worker claims jobs from pdf_jobs and runs download -> OCR -> DeepSeek ->
+mileage with its own stage pools and OCR process pool. It edits the status
+messages as it goes and leaves the rendered reply in the table; the polling
+process sends it.
+
+Rate limits are kept per process. Set JOB_WORKERS to the number of worker.py
+processes (same value everywhere, main.py included): Nominatim's 1 request/s
+(NOMINATIM_RPS) is split between the workers, Telegram's global TG_GLOBAL_RATE
+between the workers and the polling process. Per-chat limits are not split; a
+chat's status edits come from the one worker running its job.
+"""
+import asyncio
+import logging
+import os
+import sys
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.enums import ParseMode
+
+from config import BOT_TOKEN, TELEGRAM_API_URL, JOB_QUEUE_MODE
+from database.connection import init_db
+from handlers.processor import start_pipeline, stop_pipeline, claim_jobs
+from main import cleanup_temp_files
+from services.pdf_engine import start_ocr_pool, shutdown_ocr_pool
+from services.http_client import init_http_clients, close_http_clients
+
+logger = logging.getLogger("LazyAlice.Worker")
+
+
+async def main():
+    if JOB_QUEUE_MODE != "shared":
+        # In local mode main.py runs the pipeline itself; a worker would race it for the same rows
+        logger.error("worker.py needs JOB_QUEUE_MODE=shared (current: %s)", JOB_QUEUE_MODE)
+        return 1
+
+    session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)) if TELEGRAM_API_URL else None
+    bot = Bot(token=BOT_TOKEN, session=session, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+
+    os.makedirs("temp", exist_ok=True)
+    await init_db()
+    start_ocr_pool()
+    await init_http_clients()
+    start_pipeline()
+    asyncio.create_task(cleanup_temp_files())
+
+    try:
+        await claim_jobs(bot)
+    finally:
+        await stop_pipeline()
+        await close_http_clients()
+        shutdown_ocr_pool()
+        await bot.session.close()
+        logger.info("Worker stopped. 🥱💤")
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        code = asyncio.run(main())
+    except KeyboardInterrupt:
+        code = 0
+    sys.exit(code)